@@ -1,5 +1,6 @@
 import logging
 import os
+import sys
 
 
 class GerritsshException(Exception):
@@ -42,8 +43,20 @@ logging.getLogger(__name__).addHandler(__nullh)
 
 from .gerritsite import *  # noqa - inhibit F403
 from .query import *  # noqa - inhibit F403
+from .shardedquery import *  # noqa - inhibit F403
 from .review import *  # noqa - inhibit F403
+from .reviewtable import *  # noqa - inhibit F403
+from .analytics import *  # noqa - inhibit F403
+from .reviewstore import *  # noqa - inhibit F403
+from .eventstream import *  # noqa - inhibit F403
+from .responsecache import *  # noqa - inhibit F403
+from .governor import *  # noqa - inhibit F403
 from .lsprojects import *  # noqa - inhibit F403
 from .lsgroups import *  # noqa - inhibit F403
 from .lsmembers import *  # noqa - inhibit F403
 from .bancommit import *  # noqa - inhibit F403
+
+# The asyncio API relies on syntax which is only available in Python 3.5
+# and later.
+if sys.version_info >= (3, 5):  # pragma: no cover
+    from .asyncsite import *  # noqa - inhibit F403
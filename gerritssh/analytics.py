@@ -0,0 +1,257 @@
+r'''
+Aggregate statistics over the reviews of a site.
+
+A `ReviewAnalytics` object consumes a stream of reviews, such as the
+iterator returned by `Query.iter_execute`, and accumulates:
+
+* merge throughput, the number of reviews merged in each period of time
+* cycle time, from the creation of each merged review until its merge
+* time to first review, from the creation of each review until the first
+  approval of any kind by someone other than its owner
+* the number of approvals given by each reviewer
+
+No reference to the reviews is kept, so the whole history of a site can
+be processed in constant memory, bar one number per review for the
+percentiles. The few values needed from each review are collected in
+batches, and each batch is aggregated with NumPy::
+
+    import gerritssh
+
+    site = gerritssh.Site('gerrit.example.com').connect()
+    q = gerritssh.Query(query='status:merged', prefetch=2)
+    stats = gerritssh.ReviewAnalytics().update(q.iter_execute(site))
+
+    for week, merged in sorted(stats.throughput().items()):
+        print(week, merged)
+
+    print(stats.cycle_time_percentiles())
+
+The time to first review and the approvals need the approvals of every
+patch set. These are returned by a `Query` by default, but not when it
+is created with the `fields` or `keep_raw=False` arguments.
+
+NumPy is an optional dependency of gerritssh, and is needed to use this
+module.
+
+'''
+
+import datetime as dt
+
+try:  # pragma: no cover
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .review import _person_id
+
+
+class ReviewAnalytics(object):
+    '''
+    Accumulate throughput, cycle time and reviewer statistics
+
+    :param bucket:
+        The length of the periods used for `throughput`, as a timedelta.
+        The periods are aligned on multiples of the length since the
+        epoch, in UTC. The default is a week.
+
+    :param batch_size:
+        The number of reviews collected before they are aggregated
+
+    :raises: `ImportError` if NumPy is not installed
+    :raises: `ValueError` if bucket is not positive or batch_size below one
+
+    '''
+
+    def __init__(self, bucket=dt.timedelta(days=7), batch_size=10000):
+        if np is None:
+            raise ImportError('ReviewAnalytics requires numpy')
+
+        if bucket.total_seconds() <= 0:
+            raise ValueError('bucket must be a positive length of time')
+
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least one')
+
+        self.__bucket = int(bucket.total_seconds())
+        self.__batch_size = batch_size
+        self.__count = 0
+        self.__throughput = {}
+        self.__reviewers = {}
+        self.__cycle_times = []
+        self.__first_reviews = []
+        self.__batch = _Batch()
+
+    @property
+    def count(self):
+        ''' The number of reviews added '''
+        return self.__count
+
+    def add(self, review):
+        '''
+        Add a single review to the statistics
+
+        :param review: A `Review` object
+        :returns: self to allow chaining
+        '''
+        raw = review.raw
+        batch = self.__batch
+        created = raw.get('createdOn')
+        owner = _person_id(raw.get('owner'))
+
+        if raw.get('status') == 'MERGED' and 'lastUpdated' in raw:
+            batch.merged.append(raw['lastUpdated'])
+            if created is not None:
+                batch.cycle_times.append(raw['lastUpdated'] - created)
+
+        first = None
+        for ps in _raw_patchsets(raw):
+            for approval in ps.get('approvals', ()):
+                reviewer = _person_id(approval.get('by'))
+                if reviewer:
+                    batch.reviewers.append(reviewer)
+                granted = approval.get('grantedOn')
+                if reviewer != owner and granted is not None:
+                    first = granted if first is None else min(first, granted)
+
+        if first is not None and created is not None:
+            batch.first_reviews.append(max(first - created, 0))
+
+        self.__count += 1
+        batch.size += 1
+        if batch.size >= self.__batch_size:
+            self.__aggregate()
+
+        return self
+
+    def update(self, reviews):
+        '''
+        Add many reviews to the statistics
+
+        :param reviews: An iterable of `Review` objects
+        :returns: self to allow chaining
+        '''
+        for r in reviews:
+            self.add(r)
+
+        return self
+
+    def throughput(self):
+        '''
+        The number of reviews merged in each period
+
+        :returns:
+            A dictionary mapping the start of each period, as a UTC
+            `datetime`, to the number of reviews merged within it. Periods
+            in which nothing was merged are omitted.
+        '''
+        self.__aggregate()
+        return dict((_utc(start), n)
+                    for start, n in self.__throughput.items())
+
+    def cycle_time_percentiles(self, percentiles=(50, 90, 99)):
+        '''
+        Percentiles of the time from creation to merge of merged reviews
+
+        :param percentiles: The percentiles wanted, from 0 to 100
+        :returns:
+            A dictionary mapping each percentile to a `timedelta`, or an
+            empty dictionary if no merged reviews have been added
+        '''
+        self.__aggregate()
+        return _percentiles(self.__cycle_times, percentiles)
+
+    def first_review_percentiles(self, percentiles=(50, 90, 99)):
+        '''
+        Percentiles of the time from creation to the first approval by
+        someone other than the owner, for the reviews which have one
+
+        :param percentiles: The percentiles wanted, from 0 to 100
+        :returns:
+            A dictionary mapping each percentile to a `timedelta`, or an
+            empty dictionary if no reviewed reviews have been added
+        '''
+        self.__aggregate()
+        return _percentiles(self.__first_reviews, percentiles)
+
+    def approvals_by_reviewer(self):
+        '''
+        The number of approvals of any kind given by each reviewer, on any
+        patch set
+
+        :returns:
+            A dictionary mapping each reviewer's user name, else e-mail
+            address, else name, to their number of approvals
+        '''
+        self.__aggregate()
+        return dict(self.__reviewers)
+
+    def __aggregate(self):
+        ''' Fold the current batch into the totals '''
+        batch = self.__batch
+        if not batch.size:
+            return
+
+        if batch.merged:
+            merged = np.array(batch.merged, dtype=np.int64)
+            starts, counts = np.unique(merged // self.__bucket,
+                                       return_counts=True)
+            _add_counts(self.__throughput, starts * self.__bucket, counts)
+
+        if batch.reviewers:
+            reviewers, counts = np.unique(np.array(batch.reviewers),
+                                          return_counts=True)
+            _add_counts(self.__reviewers, reviewers, counts)
+
+        if batch.cycle_times:
+            self.__cycle_times.append(np.array(batch.cycle_times,
+                                               dtype=np.int64))
+
+        if batch.first_reviews:
+            self.__first_reviews.append(np.array(batch.first_reviews,
+                                                 dtype=np.int64))
+
+        self.__batch = _Batch()
+
+
+class _Batch(object):
+    ''' The values collected from the reviews since the last aggregation '''
+
+    def __init__(self):
+        self.size = 0
+        self.merged = []
+        self.cycle_times = []
+        self.first_reviews = []
+        self.reviewers = []
+
+
+def _raw_patchsets(raw):
+    ''' The raw JSON of each patch set, or just the current one '''
+    patchsets = raw.get('patchSets')
+    if patchsets is None:
+        current = raw.get('currentPatchSet')
+        patchsets = [current] if current else []
+
+    return patchsets
+
+
+def _add_counts(totals, keys, counts):
+    ''' Add the counts for each key to a dictionary of totals '''
+    for key, n in zip(keys.tolist(), counts.tolist()):
+        totals[key] = totals.get(key, 0) + n
+
+
+def _percentiles(chunks, percentiles):
+    ''' Percentiles of the seconds in a list of arrays, as timedeltas '''
+    if not chunks:
+        return {}
+
+    values = np.percentile(np.concatenate(chunks), percentiles)
+    return dict((p, dt.timedelta(seconds=float(v)))
+                for p, v in zip(percentiles, values))
+
+
+def _utc(seconds):
+    ''' Convert seconds since the epoch to a naive UTC datetime '''
+    return dt.datetime(1970, 1, 1) + dt.timedelta(seconds=seconds)
+
+__all__ = ['ReviewAnalytics']
@@ -0,0 +1,175 @@
+r'''
+An asyncio front end to a Gerrit site.
+
+`AsyncSite` mirrors the connect/execute/disconnect methods of `Site` as
+coroutines. All of the blocking SSH work is handed to a thread pool, so
+the event loop is never blocked by paramiko, and the size of that pool
+bounds how many commands are in flight at once::
+
+    import asyncio
+    import gerritssh
+
+    async def main():
+        site = gerritssh.AsyncSite('gerrit.example.com', pool_size=4)
+        await site.connect()
+        projects, reviews = await asyncio.gather(
+            gerritssh.ProjectList().execute_on_async(site),
+            gerritssh.open_reviews().execute_on_async(site))
+        await site.disconnect()
+
+Every `SiteCommand` can be awaited through `SiteCommand.execute_on_async`,
+or by passing the command to `AsyncSite.execute`.
+
+.. note::
+    This module requires Python 3.5 or later, and is only imported into
+    the top-level package on those versions.
+
+'''
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+
+from .gerritsite import Site, SiteCommand
+
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncSite(object):
+    '''
+    A Gerrit site whose commands are executed as coroutines.
+
+    :param site:
+        Either an existing `Site` object, or the site name to be passed to
+        the `Site` constructor along with `site_kwargs`.
+    :param max_workers:
+        The number of commands which may execute at once. Defaults to the
+        pool size or channel limit of the underlying site, whichever is
+        greater.
+    :param site_kwargs:
+        Any other keyword arguments are passed to the `Site` constructor
+        when `site` is a string. For example ``pool_size=4``.
+
+    :raises: TypeError if site is neither a string nor a `Site`
+    :raises: ValueError if site_kwargs are given along with a `Site` object
+
+    '''
+
+    def __init__(self, site, max_workers=None, **site_kwargs):
+        if isinstance(site, str):
+            site = Site(site, **site_kwargs)
+        elif not isinstance(site, Site):
+            raise TypeError('site must be a string or a Site object')
+        elif site_kwargs:
+            raise ValueError('Site arguments given with a Site object')
+
+        self.__site = site
+        self.__max_workers = (max_workers or
+                              max(site.pool_size, site.max_channels or 1))
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.__max_workers)
+
+    def __repr__(self):
+        return ('<gerritssh.asyncsite.AsyncSite(site=%r, max_workers=%d)>'
+                % (self.__site, self.__max_workers))
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
+        self.close()
+
+    async def __run(self, func, *args):
+        '''
+        Run a blocking function in the thread pool and await its result.
+
+        '''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.__executor,
+                                          functools.partial(func, *args))
+
+    async def connect(self):
+        '''
+        Establish an SSH connection to the site
+
+        :returns: self to allow chaining
+
+        :raises: `SSHConnectionError`
+            if it is not possible to connect to the site
+
+        '''
+        await self.__run(self.__site.connect)
+        return self
+
+    async def disconnect(self):
+        '''
+        Terminate the connection to the site
+
+        :returns: self to allow chaining
+
+        '''
+        await self.__run(self.__site.disconnect)
+        return self
+
+    async def execute(self, cmd):
+        '''
+        Execute a command and return the results
+
+        :param cmd:
+            The command to execute, either as a `SiteCommand` object or as
+            a string. A SiteCommand object is executed against the
+            underlying `Site`, exactly as for `Site.execute`.
+
+        :returns:
+            The results of the command, as returned by `Site.execute`
+
+        :raises: Any exception raised by `Site.execute`
+
+        '''
+        if isinstance(cmd, SiteCommand):
+            return await self.__run(cmd.execute_on, self.__site)
+
+        return await self.__run(self.__site.execute, cmd)
+
+    def close(self):
+        '''
+        Release the thread pool used to execute commands.
+
+        The site can not execute any further commands once closed.
+
+        '''
+        self.__executor.shutdown(wait=False)
+
+    @property
+    def blocking_site(self):
+        ''' The underlying `Site` object which executes the commands '''
+        return self.__site
+
+    @property
+    def max_workers(self):
+        ''' The maximum number of commands which may execute at once '''
+        return self.__max_workers
+
+    @property
+    def site(self):
+        ''' The site name provided to the constructor '''
+        return self.__site.site
+
+    @property
+    def version(self):
+        ''' The version of Gerrit running on the site. See `Site.version` '''
+        return self.__site.version
+
+    @property
+    def connected(self):
+        ''' Indicates if there is a connection active. '''
+        return self.__site.connected
+
+    def version_in(self, constraint):
+        ''' Does the site's version match a constraint specifier. '''
+        return self.__site.version_in(constraint)
+
+__all__ = ['AsyncSite']
@@ -34,7 +34,7 @@ connection to be used by multiple threads.
 
 from os.path import abspath, expanduser, isfile
 import socket
-from threading import Event, Lock
+from threading import BoundedSemaphore, Event, Lock
 
 from paramiko import SSHClient, SSHConfig
 from paramiko.ssh_exception import SSHException
@@ -47,6 +47,10 @@ class SSHCommandResult(object):
     The three attributes are channels representing the
     three standard streams.
 
+    Callers should call `close` once they have finished reading the
+    output, so that any resources held on behalf of the command (such
+    as a pooled connection) are released.
+
     :param stdin:  The channel's input channel
     :param stdout: Standard output channel
     :param stderr: The error output channel
@@ -59,10 +63,41 @@ class SSHCommandResult(object):
         self.stdin = stdin
         self.stdout = stdout
         self.stderr = stderr
+        self.__close_callbacks = []
+        self.__close_lock = Lock()
 
     def __repr__(self):
         return "<SSHCommandResult [%s]>" % self.command
 
+    def add_close_callback(self, callback):
+        """
+        Register a callable to be invoked, with no arguments, by `close`.
+
+        Callbacks are invoked in the order in which they were added.
+
+        """
+        self.__close_callbacks.append(callback)
+
+    def close(self):
+        """
+        Close the underlying channel and run any registered callbacks.
+
+        Calling this more than once, even from another thread while the
+        output is being read, is harmless. The callbacks are only ever run
+        once.
+
+        """
+        with self.__close_lock:
+            callbacks, self.__close_callbacks = self.__close_callbacks, []
+
+        try:
+            channel = getattr(self.stdout, 'channel', None)
+            if channel is not None:
+                channel.close()
+        finally:
+            for callback in callbacks:
+                callback()
+
 
 class GerritSSHClient(SSHClient):
 
@@ -73,10 +108,18 @@ class GerritSSHClient(SSHClient):
     :param username:     The optional user name to use on connection
     :param port:         The optional port to use
     :param keyfile_name: The optional key file to use
+    :param max_channels:
+        The optional limit on the number of commands which may run
+        concurrently over the connection. Each command runs in its own
+        channel on the one authenticated transport, so many threads can
+        share a client without opening further TCP or SSH sessions. Once
+        the limit is reached, `execute` blocks until the result of an
+        earlier command is closed.
 
     """
 
-    def __init__(self, hostname, username=None, port=None, keyfile_name=None):
+    def __init__(self, hostname, username=None, port=None, keyfile_name=None,
+                 max_channels=None):
         """ Initialize and connect to SSH. """
         super(GerritSSHClient, self).__init__()
         self.hostname = hostname
@@ -86,6 +129,13 @@ class GerritSSHClient(SSHClient):
         self.__connected = Event()
         self.lock = Lock()
 
+        if max_channels is not None and max_channels < 1:
+            raise ValueError("max_channels must be at least one")
+
+        self.max_channels = max_channels
+        self.__channels = (BoundedSemaphore(max_channels)
+                           if max_channels else None)
+
     def _configure(self):
         """
         Configure the ssh parameters from the config file.
@@ -165,13 +215,22 @@ class GerritSSHClient(SSHClient):
             raise SSHException("Failed to connect to server: %s" % e)
 
     def _connect(self):
-        """ Connect to the remote if not already _connected. """
+        """
+        Connect to the remote if not already _connected.
+
+        If the transport of an earlier connection has dropped, it is closed
+        and a new connection is made.
+
+        """
         if not self.connected:
             try:
                 self.lock.acquire()
                 # Another thread may have _connected while we were
                 # waiting to acquire the lock
                 if not self.connected:
+                    if self.__connected.is_set():
+                        self.close()
+                        self.__connected.clear()
                     self._do_connect()
                     self.__connected.set()
             except SSHException:
@@ -190,30 +249,53 @@ class GerritSSHClient(SSHClient):
             `ValueError` if `command` is not a string, or `SSHException` if
             command execution fails.
 
+        The caller must call `close` on the result once the output has been
+        read, to free the channel slot when `max_channels` is in use.
+
         """
         if not isinstance(command, str):
             raise ValueError("command must be a string")
 
         self._connect()
 
+        if self.__channels is not None:
+            self.__channels.acquire()
+
         try:
             stdin, stdout, stderr = self.exec_command(command,
                                                       bufsize=1,
                                                       timeout=None,
                                                       get_pty=False)
         except SSHException as err:
+            self._release_channel()
             raise SSHException("Command execution error: %s" % err)
+        except BaseException:
+            self._release_channel()
+            raise
+
+        result = SSHCommandResult(command, stdin, stdout, stderr)
+        result.add_close_callback(self._release_channel)
+        return result
 
-        return SSHCommandResult(command, stdin, stdout, stderr)
+    def _release_channel(self):
+        """ Give back a slot taken by `execute`. """
+        if self.__channels is not None:
+            self.__channels.release()
 
     @property
     def connected(self):
         '''
         Does the client have an open conection?
 
-        :return: True if the client is connected
+        :return:
+            True if the client is connected, and its transport has not
+            dropped since
         '''
-        return self.__connected.is_set()
+        if not self.__connected.is_set():
+            return False
+
+        transport = self.get_transport()
+        return transport is not None and transport.is_active()
 
     def disconnect(self):
         '''
@@ -224,7 +306,7 @@ class GerritSSHClient(SSHClient):
         self.lock.acquire()
 
         try:
-            if self.connected:
+            if self.__connected.is_set():
                 self.close()
                 self.__connected.clear()
         finally:
@@ -0,0 +1,509 @@
+r'''
+Subscribe to the events of a Gerrit site.
+
+Tools which react to new patch sets, merges or comments need not poll the
+site with queries. An `EventStream` runs ``gerrit stream-events`` over the
+site's connection, in a background thread, and delivers each event as an
+`Event` object through a bounded queue::
+
+    import gerritssh
+
+    site = gerritssh.Site('gerrit.example.com').connect()
+    with gerritssh.EventStream(site, event_types=['change-merged']) as events:
+        for e in events:
+            print(e.change.number, e.change.summary, 'merged by',
+                  e.submitter)
+
+Each event is an instance of the `Event` subclass for its type, such as
+`PatchsetCreated`, `ChangeMerged`, `CommentAdded` or `RefUpdated`, or of
+`Event` itself for types without a subclass.
+
+If the consumer falls behind and the queue fills, the ``backpressure``
+policy decides what happens:
+
+    ============  ========================================================
+    block         Stop reading from the site until there is room. Nothing
+                  is lost unless the site gives up on the connection, but
+                  Gerrit buffers the unread events meanwhile.
+    drop_oldest   Discard the oldest queued event to make room
+    drop_newest   Discard the new event
+    ============  ========================================================
+
+Dropped events are counted by `dropped`.
+
+When the connection drops, or the site ends the stream, the stream
+reconnects after a delay, connecting the site again if necessary. The
+delay doubles after each failure, up to a limit.
+Events created while no stream was connected are lost, so the first event
+after a reconnection is preceded by an `EventGap`, giving the period which
+may have been missed. A consumer can fill the gap by querying for the
+reviews updated within it.
+
+The stream holds one connection of the site for as long as it runs. On a
+site with a pool of connections, the others remain free for queries.
+
+'''
+
+import logging
+import threading
+import time
+
+try:  # pragma: no cover
+    import queue  # Python 3
+except ImportError:  # pragma: no cover
+    import Queue as queue  # Python 2
+
+from .internal import jsonlines
+from .review import Review, Patchset, _UNSET, _person_name, _timestamp
+
+_logger = logging.getLogger(__name__)
+
+
+class Event(object):
+    '''
+    An event reported by the site
+
+    As for `Review`, the fields of the raw JSON can be read as attributes,
+    e.g. ``event.type``.
+
+    :param raw: A dict() representing the raw JSON of the event
+
+    '''
+
+    def __init__(self, raw):
+        self.__raw = raw
+        self.__change = _UNSET
+
+    def __repr__(self):
+        return '<gerritssh.{0}({1!r})>'.format(type(self).__name__,
+                                               self.type)
+
+    def __getattr__(self, name):
+        '''
+        Allows direct and easy access to elements in the raw JSON
+        representation of the event.
+
+        :param name: The key to be returned
+        :raises: AttributeError if `name` is not a key in the raw JSON.
+
+        '''
+        # See Review.__getattr__
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        if name in self.__raw:
+            return self.__raw[name]
+
+        raise AttributeError(name)
+
+    @property
+    def raw(self):
+        ''' The raw JSON of the event '''
+        return self.__raw
+
+    @property
+    def type(self):
+        ''' The type of the event, e.g. 'change-merged' '''
+        return self.__raw.get('type')
+
+    @property
+    def created_on(self):
+        '''
+        When the event was created, or None if the site did not report it
+        '''
+        return _timestamp(self.__raw.get('eventCreatedOn'))
+
+    @property
+    def change(self):
+        '''
+        The change the event concerns, as a `Review`, or None if it does
+        not concern a change
+        '''
+        if self.__change is _UNSET:
+            raw = self.__raw.get('change')
+            self.__change = Review(raw) if raw else None
+        return self.__change
+
+    @property
+    def patchset(self):
+        '''
+        The patch set the event concerns, as a `Patchset`, or None if it
+        does not concern one
+        '''
+        raw = self.__raw.get('patchSet')
+        change = self.change
+        return Patchset(change, raw) if raw and change else None
+
+
+class PatchsetCreated(Event):
+    ''' A new patch set was uploaded '''
+
+    @property
+    def uploader(self):
+        ''' The uploader's name if available, else their user name '''
+        return _person_name(self.raw.get('uploader'))
+
+
+class ChangeMerged(Event):
+    ''' A change was merged '''
+
+    @property
+    def submitter(self):
+        ''' The submitter's name if available, else their user name '''
+        return _person_name(self.raw.get('submitter'))
+
+
+class ChangeAbandoned(Event):
+    ''' A change was abandoned '''
+
+    @property
+    def abandoner(self):
+        ''' The abandoner's name if available, else their user name '''
+        return _person_name(self.raw.get('abandoner'))
+
+
+class CommentAdded(Event):
+    ''' A comment, with or without approvals, was added to a change '''
+
+    @property
+    def author(self):
+        ''' The author's name if available, else their user name '''
+        return _person_name(self.raw.get('author'))
+
+    @property
+    def comment(self):
+        ''' The text of the comment '''
+        return self.raw.get('comment', '')
+
+    @property
+    def approvals(self):
+        '''
+        :returns:
+            A dictionary mapping the type of each approval given with the
+            comment, e.g. 'Code-Review', to its value as an integer
+        '''
+        return dict((a['type'], int(a['value']))
+                    for a in self.raw.get('approvals', ()))
+
+
+class RefUpdated(Event):
+    ''' A reference was updated, e.g. by a direct push to a branch '''
+
+    @property
+    def submitter(self):
+        ''' The submitter's name if available, else their user name '''
+        return _person_name(self.raw.get('submitter'))
+
+    @property
+    def project(self):
+        ''' The project holding the reference '''
+        return self.raw['refUpdate'].get('project')
+
+    @property
+    def ref_name(self):
+        ''' The name of the reference, e.g. 'master' or 'refs/tags/v1' '''
+        return self.raw['refUpdate'].get('refName')
+
+    @property
+    def old_rev(self):
+        ''' The SHA1 before the update, all zeroes for a new reference '''
+        return self.raw['refUpdate'].get('oldRev')
+
+    @property
+    def new_rev(self):
+        ''' The SHA1 after the update, all zeroes for a deletion '''
+        return self.raw['refUpdate'].get('newRev')
+
+
+class EventGap(object):
+    '''
+    Marks a period in which events may have been missed, because the
+    stream was not connected
+
+    :param since:
+        The last time the stream was known to be connected, as seconds
+        since the epoch. This is the creation time of the last event
+        received, if the site reported it, or the time it was received.
+
+    :param until: When the stream was found to be connected again
+
+    '''
+
+    type = 'gerritssh-gap'
+
+    def __init__(self, since, until):
+        self.since_seconds = since
+        self.until_seconds = until
+
+    def __repr__(self):
+        return '<gerritssh.EventGap({0:.0f}s)>'.format(self.seconds)
+
+    @property
+    def since(self):
+        ''' The start of the gap, as a `datetime` '''
+        return _timestamp(self.since_seconds)
+
+    @property
+    def until(self):
+        ''' The end of the gap, as a `datetime` '''
+        return _timestamp(self.until_seconds)
+
+    @property
+    def seconds(self):
+        ''' The length of the gap in seconds '''
+        return self.until_seconds - self.since_seconds
+
+
+class EventStream(object):
+    '''
+    Receive the events of a site through a bounded queue
+
+    Iterating over the stream yields each `Event`, and each `EventGap`,
+    as it arrives, until the stream is stopped and the queue is empty.
+
+    :param the_site: A connected `Site`
+
+    :param maxsize: The number of events the queue holds
+
+    :param backpressure:
+        What to do with new events when the queue is full: 'block',
+        'drop_oldest' or 'drop_newest'. See the module documentation.
+
+    :param event_types:
+        If given, only events of these types, e.g. ['patchset-created'],
+        are queued.
+
+    :param reconnect_delay:
+        Seconds to wait before the first attempt to reconnect
+
+    :param max_reconnect_delay:
+        The limit on the wait between attempts to reconnect
+
+    :param max_retries:
+        The number of consecutive failed attempts to reconnect before the
+        stream gives up. If None, the default, it never does. When it gives
+        up, iteration raises the last error once the queue is empty.
+
+    :raises: `ValueError` if maxsize is below one or the policy is unknown
+
+    '''
+
+    def __init__(self, the_site, maxsize=1000, backpressure='block',
+                 event_types=None, reconnect_delay=1.0,
+                 max_reconnect_delay=60.0, max_retries=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least one')
+
+        if backpressure not in _POLICIES:
+            raise ValueError('Unknown backpressure policy: {0}'.format(
+                backpressure))
+
+        self.__site = the_site
+        self.__queue = queue.Queue(maxsize)
+        self.__policy = backpressure
+        self.__types = frozenset(event_types) if event_types else None
+        self.__delay = reconnect_delay
+        self.__max_delay = max_reconnect_delay
+        self.__max_retries = max_retries
+        self.__stopping = threading.Event()
+        self.__thread = None
+        self.__output = None
+        self.__error = None
+        self.__interrupted = False
+        self.__received = 0
+        self.__dropped = 0
+        self.__reconnects = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __iter__(self):
+        while True:
+            event = self.get(timeout=_POLL_SECONDS)
+            if event is not None:
+                yield event
+            elif not self.running and self.__queue.empty():
+                if self.__error is not None:
+                    raise self.__error
+                return
+
+    @property
+    def running(self):
+        ''' True from `start` until the stream stops or gives up '''
+        return (self.__thread is not None and self.__thread.is_alive() and
+                not self.__stopping.is_set())
+
+    @property
+    def interrupted(self):
+        '''
+        True from a failure or end of the stream until it is connected
+        again, and so while events may be being missed
+        '''
+        return self.__interrupted
+
+    @property
+    def received(self):
+        ''' The number of events received from the site '''
+        return self.__received
+
+    @property
+    def dropped(self):
+        ''' The number of events discarded because the queue was full '''
+        return self.__dropped
+
+    @property
+    def reconnects(self):
+        ''' The number of times the stream has been reconnected '''
+        return self.__reconnects
+
+    def start(self):
+        '''
+        Start receiving events in a background thread
+
+        :returns: self to allow chaining
+
+        '''
+        if self.running:
+            return self
+
+        self.__stopping.clear()
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__run,
+                                         name='gerritssh-stream-events')
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stop receiving events
+
+        Events already queued can still be read. The command's channel is
+        closed, so the background thread exits without waiting to hear from
+        the site again, releasing its connection. It does not prevent the
+        program from exiting.
+
+        :returns: self to allow chaining
+
+        '''
+        self.__stopping.set()
+        close = getattr(self.__output, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # A generator being iterated over by the background thread,
+                # which will stop once it next hears from the site
+                pass
+        return self
+
+    def get(self, timeout=None):
+        '''
+        Wait for the next event
+
+        :param timeout: The most seconds to wait, or None to wait forever
+
+        :returns: The next `Event` or `EventGap`, or None on timeout
+
+        '''
+        try:
+            return self.__queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __run(self):
+        ''' Read events until stopped, reconnecting as needed '''
+        delay, failures = self.__delay, 0
+        last_seen = time.time()
+        gap = False
+
+        while not self.__stopping.is_set():
+            try:
+                # After the connection drops, the site must connect again
+                # before any command can be sent
+                if not self.__site.connected:
+                    self.__site.connect()
+
+                self.__output = self.__site.execute_stream('stream-events')
+                if self.__stopping.is_set():
+                    return
+
+                for line in self.__output:
+                    raw = jsonlines.loads(line)
+                    if gap:
+                        self.__interrupted = False
+                        self.__offer(EventGap(last_seen, time.time()))
+                        gap = False
+
+                    delay, failures = self.__delay, 0
+                    last_seen = raw.get('eventCreatedOn') or time.time()
+                    self.__received += 1
+                    if self.__types is None or raw.get('type') in self.__types:
+                        self.__offer(_event(raw))
+
+                    if self.__stopping.is_set():
+                        return
+
+                _logger.debug('The site ended the event stream')
+                self.__interrupted = True
+            except Exception as e:
+                _logger.debug('Event stream failed: {0!r}'.format(e))
+                self.__interrupted = True
+                failures += 1
+                if (self.__max_retries is not None and
+                        failures > self.__max_retries):
+                    self.__error = e
+                    return
+
+            gap = True
+            if self.__stopping.wait(delay):
+                return
+
+            delay = min(delay * 2, self.__max_delay)
+            self.__reconnects += 1
+
+    def __offer(self, event):
+        ''' Queue an event, applying the backpressure policy '''
+        while not self.__stopping.is_set():
+            try:
+                if self.__policy == 'block':
+                    self.__queue.put(event, timeout=_POLL_SECONDS)
+                else:
+                    self.__queue.put_nowait(event)
+                return
+            except queue.Full:
+                if self.__policy == 'drop_newest':
+                    self.__dropped += 1
+                    return
+
+                if self.__policy == 'drop_oldest':
+                    try:
+                        self.__queue.get_nowait()
+                        self.__dropped += 1
+                    except queue.Empty:  # pragma: no cover
+                        pass
+
+
+def _event(raw):
+    ''' Create the `Event` subclass for the type of a raw event '''
+    return _EVENT_TYPES.get(raw.get('type'), Event)(raw)
+
+# The classes of each type of event with its own subclass
+_EVENT_TYPES = {
+    'patchset-created': PatchsetCreated,
+    'change-merged': ChangeMerged,
+    'change-abandoned': ChangeAbandoned,
+    'comment-added': CommentAdded,
+    'ref-updated': RefUpdated,
+    }
+
+_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+# How often blocked threads check whether the stream has stopped
+_POLL_SECONDS = 0.1
+
+__all__ = ['EventStream', 'Event', 'EventGap', 'PatchsetCreated',
+           'ChangeMerged', 'ChangeAbandoned', 'CommentAdded', 'RefUpdated']
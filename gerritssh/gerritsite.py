@@ -43,15 +43,22 @@ iterates over the list of results returned by calling `execute_on`
 
 import logging
 import re
-import json
-import collections
 import abc
 
+try:  # pragma: no cover
+    from collections.abc import Iterable  # Python 3.3+
+except ImportError:  # pragma: no cover
+    from collections import Iterable
+
 import semantic_version as SV
 
 from gerritssh import GerritsshException
 from gerritssh.borrowed import ssh
+from gerritssh.internal import jsonlines
+from gerritssh.internal.singleflight import SingleFlight
+from gerritssh.internal.sshpool import SSHConnectionPool
 from gerritssh.internal.cmdoptions import *  # noqa
+from gerritssh.governor import current_priority
 
 
 _logger = logging.getLogger(__name__)
@@ -88,8 +95,38 @@ class Site(object):
         The optional port to connect on
     :param keyfile:
         The optional file containing the SSH key to use
+    :param pool_size:
+        The number of SSH connections to maintain. With the default of 1,
+        all commands share a single connection. With a larger value, each
+        command checks out an idle connection for its duration, blocking
+        until one is available. Every connection in the pool is
+        established by `connect`, so no handshake is paid per command.
+    :param max_channels:
+        Only valid with a single connection. Rather than pooling
+        connections, commands from different threads run concurrently as
+        separate channels over the one SSH transport, up to this limit.
+        If omitted, the number of concurrent channels is not limited.
+    :param cache:
+        An optional `ResponseCache`, which keeps the output of read-only
+        commands executed as strings, whether by `execute` or by
+        `execute_stream`, and so by the `SiteCommand` classes. The cache
+        is shared with any copy of the site.
+    :param coalesce:
+        If True, the default, a read-only command executed by one thread
+        while another is executing the same command line, and has not yet
+        received any output, is not sent again. The second thread waits
+        for the first's output, and is given a copy of it.
+    :param governor:
+        An optional `Governor`, limiting the number of commands in flight
+        and the rate at which they are sent, and ordering the commands
+        waiting by priority. It is shared with any copy of the site. If it
+        has no ``max_in_flight``, and the site has a pool or
+        ``max_channels``, it is limited to the connections or channels.
 
     :raises: TypeError if sitename is not a string
+    :raises: ValueError
+        if pool_size or max_channels is less than one, or if both
+        pool_size and max_channels are given
 
     Usage::
 
@@ -101,18 +138,52 @@ class Site(object):
         except gerritssh.SSHConnectionError:
             print('Failed to connect to site '+mysite.site)
 
+    A Site may be shared between threads. To spread the work over several
+    connections, create a pooled site::
+
+        mysite = gerritssh.Site('gerrit.example.com', pool_size=4).connect()
+        # Up to four threads can now execute commands on mysite at once
+
+    or, where the number of SSH sessions per user is capped, multiplex the
+    commands over a single connection::
+
+        mysite = gerritssh.Site('gerrit.example.com', max_channels=4)
+
     '''
 
-    def __init__(self, sitename, username=None, port=None, keyfile=None):
+    def __init__(self, sitename, username=None, port=None, keyfile=None,
+                 pool_size=1, max_channels=None, cache=None,
+                 coalesce=True, governor=None):
         if not isinstance(sitename, str):
             raise TypeError('sitename must be a string')
 
+        if pool_size < 1:
+            raise ValueError('pool_size must be at least one')
+
+        if max_channels is not None and pool_size > 1:
+            raise ValueError('max_channels can not be used with a pool')
+
         self.__init_args = (sitename, username, port, keyfile)
+        self.__pool_size = pool_size
+        self.__max_channels = max_channels
+        self.__cache = cache
+        self.__flights = SingleFlight() if coalesce else None
+        self.__governor = governor
+        if governor is not None and (pool_size > 1 or max_channels):
+            # Commands waiting for a connection or channel are served in
+            # the order they arrive, so only the governor can order them
+            governor.default_max_in_flight(max(pool_size, max_channels or 1))
+
         self.__site = sitename
         self.__ssh_prefix = 'gerrit'
         self.__version = SV.Version('0.0.0')
         self.__keyfile = keyfile
-        self.__ssh = ssh.GerritSSHClient(sitename, username, port, keyfile)
+        if pool_size > 1:
+            self.__ssh = SSHConnectionPool(pool_size, sitename, username,
+                                           port, keyfile)
+        else:
+            self.__ssh = ssh.GerritSSHClient(sitename, username, port,
+                                             keyfile, max_channels)
 
     def __repr__(self):
         ''' String representation of the instance '''
@@ -144,7 +215,12 @@ class Site(object):
 
         '''
         _logger.debug('copy<%s>' % self)
-        return Site(*self.__init_args)
+        return Site(*self.__init_args,
+                    pool_size=self.__pool_size,
+                    max_channels=self.__max_channels,
+                    cache=self.__cache,
+                    coalesce=self.__flights is not None,
+                    governor=self.__governor)
 
     # Alias the magic methods used by the copy module
     __copy__ = copy
@@ -163,6 +239,82 @@ class Site(object):
         ver = results.groups()[0] if results else '0.0.0'
         return ver
 
+    def __stream_command(self, command, args='', priority=None):
+        '''
+        Private method to execute a command and iterate over its output
+
+        The command is sent when iteration begins. Each line is decoded
+        and yielded as soon as it is read from the channel, and the
+        channel is closed when the iterator is exhausted, discarded or
+        closed.
+
+        :returns: A `_CommandOutput` over the output lines, as strings
+        :raises: :exc: `SSHException` if the command fails
+
+        '''
+        control = _CommandControl()
+        return _CommandOutput(
+            self.__command_lines(control, command, args, priority), control)
+
+    def __command_lines(self, control, command, args, priority):
+        ''' Private generator behind `__stream_command` '''
+        cmdline = '{0} {1} {2}'.format(self.__ssh_prefix, command, args)
+        governor = self.__governor
+        if governor is not None:
+            governor.acquire(command, priority)
+
+        try:
+            _logger.debug('Site Executing: %s' % cmdline)
+            result = self.__ssh.execute(cmdline)
+            _logger.debug('Command Response:%s' % repr(result))
+
+            try:
+                # The output may have been closed by another thread while
+                # the command was being sent
+                control.result = result
+                if control.closed:
+                    return
+
+                for chunk in result.stdout:
+                    for l in chunk.splitlines():
+                        yield (l if isinstance(l, str)
+                               else str(l.decode('utf-8')))
+            finally:
+                result.close()
+        finally:
+            if governor is not None:
+                governor.release(command)
+
+    def __run_command(self, cmd):
+        '''
+        Private method to execute a command through the cache, if any, and
+        coalescing it with identical concurrent commands, if enabled
+
+        :returns: An iterator over the output lines, as strings
+
+        '''
+        # The priority is that of the calling thread, rather than of the
+        # thread which eventually iterates over the output
+        priority = current_priority()
+
+        def coalesced(cmd):
+            ''' Execute the command, sharing its output '''
+            key = ' '.join(cmd.split())
+            if (self.__flights is None or
+                    key.split(' ', 1)[0] not in _READ_ONLY_COMMANDS):
+                return self.__stream_command(cmd, priority=priority)
+
+            # Commands of different priorities are not shared, so that an
+            # urgent command never waits for a bulk one
+            return self.__flights.stream(
+                (priority, key),
+                lambda: self.__stream_command(cmd, priority=priority))
+
+        if self.__cache is not None:
+            return self.__cache.fetch(cmd, coalesced)
+
+        return coalesced(cmd)
+
     def __do_command(self, command, args=''):
         '''
         Private method to actually execute a command
@@ -171,14 +323,7 @@ class Site(object):
         :raises: :exc: `SSHException` if the command fails
 
         '''
-        cmdline = '{0} {1} {2}'.format(self.__ssh_prefix, command, args)
-        _logger.debug('Site Executing: %s' % cmdline)
-        result = self.__ssh.execute(cmdline)
-        _logger.debug('Command Response:%s' % repr(result))
-#         return result if isinstance(result, str) else result.decode('utf-8')
-        retval = [l for s in result.stdout.readlines() for l in s.splitlines()]
-        retval = [(l if isinstance(l, str) else str(l.decode('utf-8')))
-                  for l in retval]
+        retval = list(self.__stream_command(command, args))
         _logger.debug('Returning:{0}'.format(retval))
         return retval
 
@@ -200,6 +345,8 @@ class Site(object):
 
         try:
             resp = self.__do_command('version')
+            if self.__pool_size > 1:
+                self.__ssh.warm_up()
         except ssh.SSHException as e:
             _logger.debug('Failed to connect: ' + str(e.args))
             raise SSHConnectionError('Failed to connect to ' + self.site)
@@ -241,14 +388,78 @@ class Site(object):
         :raises:
             `CalledProcessError` if the command returns an error
 
+        '''
+        self.__check_command(cmd)
+
+        if isinstance(cmd, SiteCommand):
+            return cmd.execute_on(self)
+
+        retval = list(self.__run_command(cmd))
+        _logger.debug('Returning:{0}'.format(retval))
+        return retval
+
+    def execute_stream(self, cmd):
+        '''
+        Execute a command, returning an iterator over its output
+
+        Unlike `execute`, the output is not collected into a list. Each
+        line is yielded as soon as it arrives from the site, so the first
+        results can be processed before the command has finished, and
+        only a small buffer of the output is held in memory at any time.
+        The whole output is only held if it is being kept by a cache, or
+        for other threads which executed the same command before its
+        output began, and are waiting to share it.
+
+        The command is sent when iteration begins, and the channel is
+        closed once the iterator is exhausted, or discarded early. The
+        iterator has a ``close`` method. For a command which is neither
+        cached nor shared, such as ``stream-events``, it may be called from
+        another thread to close the channel while a thread waits for
+        output.
+
+        :param str cmd: The command to execute
+
+        :returns:
+            An iterator over stripped strings containing the output of the
+            command.
+
+        :raises:
+            `InvalidCommandError` if cmd is not a non-empty string
+
+        :raises:
+            `SSHConnectionError` if there is no current connection to the site
+
+        Usage::
+
+            for line in mysite.execute_stream('ls-projects'):
+                print(line)
+
+        '''
+        self.__check_command(cmd)
+
+        if isinstance(cmd, SiteCommand):
+            _logger.debug('Attempted to stream a SiteCommand')
+            raise InvalidCommandError('Only command strings can be streamed')
+
+        return self.__run_command(cmd)
+
+    def __check_command(self, cmd):
+        '''
+        Validate the arguments to execute and execute_stream
+
+        :raises:
+            `SSHConnectionError` if there is no current connection to the site
+
+        :raises:
+            `InvalidCommandError` if cmd is neither a `SiteCommand` nor a
+            non-empty string
+
         '''
         if not self.connected:
             _logger.debug('Attempted to execute command without a connection')
             raise SSHConnectionError('No connection')
 
-        if isinstance(cmd, SiteCommand):
-            return cmd.execute_on(self)
-        elif cmd and not isinstance(cmd, str):
+        if cmd and not isinstance(cmd, (str, SiteCommand)):
             _logger.debug('Invalid argument to cmd. Got type '
                           + str(type(cmd)))
             raise InvalidCommandError(('Expected an instance of SiteCommand,'
@@ -259,7 +470,33 @@ class Site(object):
             _logger.debug('No command found')
             raise InvalidCommandError('No command found')
 
-        return self.__do_command(cmd)
+    @property
+    def pool_size(self):
+        ''' The number of SSH connections maintained for the site '''
+        return self.__pool_size
+
+    @property
+    def max_channels(self):
+        ''' The limit on concurrent channels, or None if unlimited '''
+        return self.__max_channels
+
+    @property
+    def cache(self):
+        ''' The `ResponseCache` for the site, or None '''
+        return self.__cache
+
+    @property
+    def governor(self):
+        ''' The `Governor` for the site, or None '''
+        return self.__governor
+
+    @property
+    def coalesced(self):
+        '''
+        The number of commands which shared the output of an identical
+        command executing at the same time
+        '''
+        return self.__flights.shared if self.__flights is not None else 0
 
     @property
     def site(self):
@@ -328,6 +565,61 @@ class Site(object):
         return self.__ssh.connected
 
 
+class _CommandControl(object):
+    '''
+    The result of a command being read by a generator, and whether its
+    output has been closed. Kept apart from `_CommandOutput`, so that the
+    generator does not refer to the output holding it.
+    '''
+
+    def __init__(self):
+        self.result = None
+        self.closed = False
+
+
+class _CommandOutput(object):
+    '''
+    An iterator over the output lines of a command, which can be closed
+    from any thread
+
+    Closing the output from another thread, while a thread is blocked
+    reading it, closes the command's channel. The reading thread then
+    finds the output at an end.
+
+    '''
+
+    def __init__(self, lines, control):
+        self.__lines = lines
+        self.__control = control
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.__lines)
+
+    next = __next__  # Python 2
+
+    def close(self):
+        ''' Abandon the command, closing its channel '''
+        control = self.__control
+        control.closed = True
+        if control.result is not None:
+            control.result.close()
+
+        try:
+            self.__lines.close()
+        except ValueError:
+            # The generator is running in another thread, which will now
+            # find the channel closed
+            pass
+
+
+# Commands which do not change the site, and so may be coalesced or cached
+_READ_ONLY_COMMANDS = frozenset(['ls-projects', 'ls-groups', 'ls-members',
+                                 'query', 'version'])
+
+
 # The unusual class definition is a version-agnostic means
 # of setting the metaclass attribute for the class. It creates, at runtime,
 # a temporary class 'newbase' with a meta-class of ABCMeta and base class of
@@ -488,6 +780,19 @@ class SiteCommand(abc.ABCMeta('newbase', (object,), {})):
         :raises: TypeError
         '''
 
+    def execute_on_async(self, the_site):
+        '''
+        Execute the command on an `AsyncSite`, without blocking the
+        event loop.
+
+        :param the_site: A connected `AsyncSite` object
+
+        :returns:
+            An awaitable which produces the same results as `execute_on`
+
+        '''
+        return the_site.execute(self)
+
     @staticmethod
     def text_to_list(text_or_list, nonempty=False):
         r'''
@@ -522,7 +827,7 @@ class SiteCommand(abc.ABCMeta('newbase', (object,), {})):
         if isinstance(text_or_list, str):
             text_or_list = [text_or_list]
 
-        if not (isinstance(text_or_list, collections.Iterable) and
+        if not (isinstance(text_or_list, Iterable) and
                 all([isinstance(x, str) for x in text_or_list])):
             raise TypeError('Argument must be a string or list of strings')
 
@@ -536,30 +841,24 @@ class SiteCommand(abc.ABCMeta('newbase', (object,), {})):
         '''
         Convert one or more JSON strings to a list of dictionaries.
 
-        Every string is split and stripped (via :meth:`text_to_list`)
-        before decoding. All empty strings (or substrings) are ignored.
+        Every string is split into lines, and each non-empty line is
+        stripped and decoded, in a single pass over the input. A faster
+        JSON library is used for decoding when one is installed (see
+        `gerritssh.internal.jsonlines`).
 
         :param text_or_list:
             Either a single string, or a list of strings to be interpreted as
             JSON.
         :returns [dict]:
-            A list of dictionaries, one per string, produced by interpreting
-            each string JSON.
+            A list of dictionaries, one per line, produced by interpreting
+            each line as JSON.
+        :raises:
+            :exc:`TypeError` if text_or_list` is not one or more strings.
         :raises:
-            :exc:`TypeError` if text_or_list` is not one or more strings or if
-            one of the strings can't be decoded as valid JSON.
+            :exc:`ValueError` if one of the lines can't be decoded as valid
+            JSON.
 
         '''
-        if isinstance(text_or_list, str):
-            text_or_list = SiteCommand.text_to_list(text_or_list,
-                                                    nonempty=True)
-
-        if not (isinstance(text_or_list, collections.Iterable) and
-                all([isinstance(x, str) for x in text_or_list])):
-            raise TypeError('Argument must be one or more strings')
-
-        jstrings = [s for l in text_or_list
-                    for s in SiteCommand.text_to_list(l, nonempty=True)]
-        return [json.loads(s) for s in [_f for _f in jstrings if _f]]
+        return list(jsonlines.iter_json(text_or_list))
 
 __all__ = ['Site', 'SSHConnectionError', 'InvalidCommandError', 'SiteCommand']
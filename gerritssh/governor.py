@@ -0,0 +1,402 @@
+r'''
+Limits on the rate and concurrency of the commands sent to a site, and
+the priority of the commands waiting.
+
+Gerrit limits the SSH sessions and commands of each user, and throttles
+or refuses a user who exceeds them. A service account shared by many
+threads, or by a `ShardedQuery`, can easily do so. A `Governor` given to
+a `Site` keeps the commands it sends within limits chosen to match the
+site's::
+
+    import gerritssh
+
+    governor = gerritssh.Governor(max_in_flight=4,
+                                  rates={'query': 10, 'ls-members': 2},
+                                  burst=5)
+    site = gerritssh.Site('gerrit.example.com', pool_size=4,
+                          governor=governor).connect()
+
+Each command sent waits, if necessary, for two things in turn:
+
+1. A token from the bucket for its command name, if that command has a
+   rate. Each bucket holds up to ``burst`` tokens and is refilled at the
+   command's rate per second, so short bursts pass at once but the
+   average rate is kept to.
+2. One of the ``max_in_flight`` slots, held until its output has been
+   read and its channel closed.
+
+Commands waiting for the same bucket are served in the order they
+arrived. A command waiting for a token does not hold up commands of other
+types.
+
+Commands waiting for a slot are served in order of priority. Each thread
+has a priority, which applies to every command it executes, including
+those executed on its behalf by the threads of a `Query` or
+`ShardedQuery`. The priority is `Priority.NORMAL` unless changed with
+`command_priority`, so that, for example, a backfill does not delay the
+commands of users::
+
+    with gerritssh.command_priority(gerritssh.Priority.BULK):
+        for r in gerritssh.Query(query='status:merged').iter_execute(site):
+            store(r)
+
+To prevent starvation, a waiting command is promoted by one class of
+priority for every ``aging`` seconds it waits. A bulk command is thus
+never overtaken by more than the commands which arrive within twice that
+time of it. Commands of the same priority are served in the order they
+arrived. `queue_depths` and `wait_seconds` show how long the queues are,
+and how long each class has waited.
+
+Priority only decides which waiting command is given the next slot. A
+command holding a slot may still wait for a connection of a pooled site,
+or a channel of a site with ``max_channels``, and those are handed out in
+the order the commands arrive. For the priority to apply, ``max_in_flight``
+should not exceed the number of connections or channels, less one for
+each `EventStream` on the site. A site with a pool, or ``max_channels``,
+gives a governor without ``max_in_flight`` that number.
+
+Commands answered by a `ResponseCache`, or by sharing the output of an
+identical command, are not sent, and so are not limited. The output of a
+``stream-events`` command never ends, so it takes a token but not a
+slot.
+
+A governor may be shared between several sites, such as the copies of a
+site, to apply the limits to all of them together.
+
+'''
+
+import collections
+import contextlib
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class Priority(object):
+    '''
+    The classes of priority of commands. Commands with lower values are
+    sent first.
+    '''
+
+    #: Commands a user is waiting for
+    INTERACTIVE = 0
+
+    #: The default
+    NORMAL = 1
+
+    #: Background work such as backfills and sweeps
+    BULK = 2
+
+
+# The priority of the commands of each thread, in attribute 'priority'
+_local = threading.local()
+
+
+def current_priority():
+    '''
+    :returns:
+        The priority of the commands executed by the current thread, from
+        `Priority`
+    '''
+    return getattr(_local, 'priority', Priority.NORMAL)
+
+
+@contextlib.contextmanager
+def command_priority(priority):
+    '''
+    Context manager setting the priority of the commands executed by the
+    current thread within it
+
+    :param priority: A value from `Priority`, or any integer
+
+    Usage::
+
+        with gerritssh.command_priority(gerritssh.Priority.INTERACTIVE):
+            members = gerritssh.ListMembers('Developers').execute_on(site)
+
+    '''
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class Governor(object):
+    '''
+    Limit the commands in flight, and the rate of each type of command
+
+    :param max_in_flight:
+        The most commands executing at once. If omitted, the number is not
+        limited, unless the governor is given to a `Site` with a pool of
+        connections or ``max_channels``, which limits it to that number.
+
+    :param rates:
+        A dictionary mapping command names, such as 'query', to the most
+        commands per second of that type, on average. Commands not named
+        are limited by `default_rate`.
+
+    :param default_rate:
+        The most commands per second of each type not named in `rates`.
+        If omitted, they are not rate limited.
+
+    :param burst:
+        The most commands of one type which may be sent at once, after a
+        pause, before the rate applies
+
+    :param aging:
+        The seconds a command waits for a slot before it is promoted by one
+        class of priority. With 0, commands are served in the order they
+        arrive, whatever their priority.
+
+    :raises: `ValueError` if any limit is not positive, or aging negative
+
+    '''
+
+    def __init__(self, max_in_flight=None, rates=None, default_rate=None,
+                 burst=1, aging=10.0):
+        rates = dict(rates or {})
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least one')
+
+        if burst < 1:
+            raise ValueError('burst must be at least one')
+
+        if aging < 0:
+            raise ValueError('aging must not be negative')
+
+        if any(r <= 0 for r in list(rates.values()) + [default_rate]
+               if r is not None):
+            raise ValueError('Rates must be positive')
+
+        self.__max_in_flight = max_in_flight
+        self.__rates = rates
+        self.__default_rate = default_rate
+        self.__burst = burst
+        self.__aging = aging
+        self.__buckets = {}
+        self.__slot_queue = []
+        self.__sequence = itertools.count()
+        self.__in_flight = 0
+        self.__throttled = 0
+        self.__peak_queue_depth = 0
+        self.__wait_seconds = collections.defaultdict(float)
+        self.__condition = threading.Condition()
+
+    @property
+    def max_in_flight(self):
+        ''' The most commands executing at once, or None if unlimited '''
+        return self.__max_in_flight
+
+    @property
+    def in_flight(self):
+        ''' The number of commands executing, other than ``stream-events`` '''
+        return self.__in_flight
+
+    @property
+    def waiting(self):
+        ''' The number of commands waiting for a token or a slot '''
+        with self.__condition:
+            return (len(self.__slot_queue) +
+                    sum(len(b.queue) for b in self.__buckets.values()))
+
+    @property
+    def throttled(self):
+        ''' The number of commands which had to wait for a token '''
+        return self.__throttled
+
+    @property
+    def queue_depths(self):
+        '''
+        :returns:
+            A dictionary mapping each priority to the number of commands of
+            that priority waiting for a slot. Priorities with none waiting
+            are omitted.
+        '''
+        with self.__condition:
+            depths = collections.Counter(w.priority
+                                         for w in self.__slot_queue)
+        return dict(depths)
+
+    @property
+    def peak_queue_depth(self):
+        ''' The most commands which have waited for a slot at once '''
+        return self.__peak_queue_depth
+
+    @property
+    def wait_seconds(self):
+        '''
+        :returns:
+            A dictionary mapping each priority to the total seconds its
+            commands have waited for a slot
+        '''
+        with self.__condition:
+            return dict(self.__wait_seconds)
+
+    def acquire(self, cmd, priority=None):
+        '''
+        Wait until a command may be sent
+
+        This is called by `Site`, rather than by clients of the governor.
+        Every call must be followed by a call to `release`, once the
+        command has finished.
+
+        :param str cmd: The command line, without the 'gerrit' prefix
+        :param priority:
+            The priority of the command. The default is the priority of the
+            current thread.
+
+        '''
+        name = cmd.split(None, 1)[0] if cmd.strip() else ''
+        if priority is None:
+            priority = current_priority()
+
+        with self.__condition:
+            bucket = self.__bucket(name)
+            if bucket is not None:
+                self.__take_token(bucket)
+
+            if name == 'stream-events':
+                return
+
+            if self.__max_in_flight is None:
+                self.__in_flight += 1
+            else:
+                self.__take_slot(priority)
+
+    def release(self, cmd):
+        '''
+        Record that a command has finished
+
+        :param str cmd: The command line passed to `acquire`
+
+        '''
+        name = cmd.split(None, 1)[0] if cmd.strip() else ''
+        if name == 'stream-events':
+            return
+
+        with self.__condition:
+            self.__in_flight -= 1
+            self.__condition.notify_all()
+
+    def default_max_in_flight(self, limit):
+        '''
+        Limit the commands in flight, unless they are limited already
+
+        This is called by `Site`, with the number of connections or
+        channels it may use at once, so that commands do not wait for them
+        beyond the governor, where their priority does not apply.
+
+        :param int limit: The most commands executing at once
+
+        '''
+        with self.__condition:
+            if self.__max_in_flight is None:
+                self.__max_in_flight = limit
+                self.__condition.notify_all()
+
+    def __take_slot(self, priority):
+        '''
+        Wait for a slot, in order of priority. The condition must be held.
+
+        A waiter's place in the queue is fixed when it arrives: it is
+        served as if it had arrived `aging` seconds later for each class
+        its priority is below the highest. Promoting waiters as they age
+        would give the same order.
+
+        '''
+        arrived = time.time()
+        waiter = _Waiter(arrived + priority * self.__aging,
+                         next(self.__sequence), priority)
+        heapq.heappush(self.__slot_queue, waiter)
+        self.__peak_queue_depth = max(self.__peak_queue_depth,
+                                      len(self.__slot_queue))
+        while (self.__slot_queue[0] is not waiter or
+               self.__in_flight >= self.__max_in_flight):
+            self.__condition.wait()
+
+        heapq.heappop(self.__slot_queue)
+        self.__in_flight += 1
+        self.__wait_seconds[priority] += time.time() - arrived
+        self.__condition.notify_all()
+
+    def __bucket(self, name):
+        ''' The token bucket for a command name, or None if unlimited '''
+        bucket = self.__buckets.get(name)
+        if bucket is None:
+            rate = self.__rates.get(name, self.__default_rate)
+            if rate is None:
+                return None
+            bucket = self.__buckets[name] = _TokenBucket(rate, self.__burst)
+        return bucket
+
+    def __take_token(self, bucket):
+        ''' Wait in turn for a token. The condition must be held. '''
+        ticket = object()
+        bucket.queue.append(ticket)
+        throttled = False
+        while True:
+            if bucket.queue[0] is ticket:
+                delay = bucket.take()
+                if delay == 0:
+                    break
+            else:
+                delay = None
+
+            throttled = True
+            self.__condition.wait(delay)
+
+        bucket.queue.popleft()
+        if throttled:
+            self.__throttled += 1
+        self.__condition.notify_all()
+
+
+class _Waiter(object):
+    ''' A command waiting for a slot, ordered by when it is to be served '''
+
+    __slots__ = ('key', 'priority')
+
+    def __init__(self, due, sequence, priority):
+        self.key = (due, sequence)
+        self.priority = priority
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class _TokenBucket(object):
+    '''
+    Tokens for one type of command, refilled at a steady rate up to a
+    limit. The waiting commands are queued in 'queue'.
+    '''
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.time()
+        self.queue = collections.deque()
+
+    def take(self):
+        '''
+        Take a token if one is available
+
+        :returns: 0 if a token was taken, else the seconds until one is
+        '''
+        now = time.time()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+__all__ = ['Governor', 'Priority', 'command_priority', 'current_priority']
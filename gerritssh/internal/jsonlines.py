@@ -0,0 +1,112 @@
+r'''
+Decoding of the line-oriented JSON output of Gerrit commands.
+
+Commands such as ``query --format JSON`` write one JSON object per line.
+`iter_json` decodes such output in a single pass, one line at a time,
+without building any intermediate lists.
+
+Decoding is the main cost of processing large query results, so a faster
+JSON library is used in place of the standard `json` module when one is
+installed. orjson is preferred, then ujson. All of them raise a
+`ValueError` for invalid JSON. `backend` names the library in use.
+
+Values such as project and branch names, user names, e-mail addresses,
+statuses and label names repeat across the results of a large query, yet
+each is decoded into a separate string. `interned` replaces those values,
+and the keys of every object, with a single shared copy of each, reducing
+the memory needed to keep many results.
+
+This is an internal module. Clients use `SiteCommand.text_to_json`, or
+simply execute a `Query`.
+
+'''
+
+try:  # pragma: no cover
+    import orjson as _json
+except ImportError:  # pragma: no cover
+    try:
+        import ujson as _json
+    except ImportError:
+        import json as _json
+
+try:  # pragma: no cover
+    from sys import intern  # Python 3
+except ImportError:  # pragma: no cover
+    pass  # A builtin in Python 2
+
+backend = _json.__name__
+
+# Decode a single JSON document from a string
+loads = _json.loads
+
+
+def iter_json(text_or_list):
+    '''
+    Generator decoding each non-empty line of the input as JSON
+
+    :param text_or_list:
+        Either a single string, or an iterable of strings, each of which
+        may contain several lines.
+
+    :returns: An iterator over the decoded objects, one per non-empty line
+
+    :raises:
+        `TypeError` if `text_or_list` is not a string or an iterable of
+        strings. This is only raised when the offending item is reached.
+
+    :raises: `ValueError` if a line is not valid JSON
+
+    '''
+    if isinstance(text_or_list, str):
+        text_or_list = (text_or_list,)
+
+    for text in text_or_list:
+        if not isinstance(text, str):
+            raise TypeError('Argument must be one or more strings')
+
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+# The fields whose values repeat across reviews, and so are interned
+_REPEATED_FIELDS = frozenset(['project', 'branch', 'topic', 'status',
+                              'name', 'username', 'email', 'type',
+                              'description', 'value', 'kind', 'label'])
+
+
+def interned(obj):
+    '''
+    Intern the repeated strings in a decoded JSON object
+
+    The keys of every object are interned, as are string values of the
+    fields which commonly repeat between results, such as project,
+    branch, status, user names and e-mail addresses, and label names.
+    Objects and lists are updated in place.
+
+    :param obj: An object produced by decoding JSON
+
+    :returns: obj, for convenience
+
+    '''
+    if isinstance(obj, dict):
+        items = []
+        for key, value in obj.items():
+            if isinstance(value, str):
+                if key in _REPEATED_FIELDS:
+                    value = intern(value)
+            else:
+                value = interned(value)
+            items.append((intern(key), value))
+
+        # Rebuilding the object replaces each key with its interned copy
+        obj.clear()
+        obj.update(items)
+    elif isinstance(obj, list):
+        for value in obj:
+            if isinstance(value, (dict, list)):
+                interned(value)
+
+    return obj
+
+__all__ = ['backend', 'interned', 'iter_json', 'loads']
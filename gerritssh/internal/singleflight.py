@@ -0,0 +1,130 @@
+r'''
+Coalescing of identical commands executed concurrently.
+
+When several threads sharing a `Site` execute the same read-only command
+at the same moment, only the first sends it to the site. The others wait
+for its output, and are given a copy of it. This is an internal class,
+used by `Site` unless it is created with ``coalesce=False``.
+
+'''
+
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class SingleFlight(object):
+    '''
+    Share the output of a command among the callers awaiting it
+
+    The first caller of `stream` for a key runs the command and passes on
+    its output as it arrives. Callers from other threads for the same key,
+    until the first line of output arrives, wait for it to finish and then
+    receive the same output, or the exception it raised. If the first
+    caller abandons the output part way through, the waiting callers each
+    run the command themselves.
+
+    The output is only kept in memory if another caller is waiting for it.
+    Callers arriving once the output has begun run the command themselves,
+    so output which nobody is waiting for is never kept.
+
+    A thread calling `stream` again for a key it is already running, e.g.
+    while iterating over the output, runs the command again rather than
+    waiting for itself.
+
+    '''
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.__shared = 0
+
+    @property
+    def shared(self):
+        ''' The number of callers given the output of another's command '''
+        return self.__shared
+
+    def stream(self, key, execute):
+        '''
+        Generator yielding the output of a command, shared with any
+        concurrent callers for the same key
+
+        Nothing happens until iteration begins.
+
+        :param key: Identifies the command, e.g. its normalized command line
+        :param execute:
+            A function of no arguments which runs the command, returning
+            an iterator over its output lines
+
+        '''
+        me = threading.current_thread()
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is None:
+                call = self.__calls[key] = _Call(me)
+                leading = True
+            else:
+                leading = False
+                following = not call.started and call.thread is not me
+                if following:
+                    call.followers += 1
+
+        if not leading:
+            if not following:
+                # Our own call, or too late to be given its output
+                for line in execute():
+                    yield line
+                return
+
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+
+            if call.lines is not None:
+                with self.__lock:
+                    self.__shared += 1
+                _logger.debug('Shared the output of: {0}'.format(key))
+                for line in call.lines:
+                    yield line
+                return
+
+            # The call was abandoned
+            for line in execute():
+                yield line
+            return
+
+        lines = []
+        buffering = None
+        try:
+            for line in execute():
+                if buffering is None:
+                    # No more followers may join once the output has begun
+                    with self.__lock:
+                        call.started = True
+                        buffering = call.followers > 0
+                if buffering:
+                    lines.append(line)
+                yield line
+            call.lines = lines
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+
+
+class _Call(object):
+    ''' A command in progress, and its outcome once finished '''
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.started = False
+        self.followers = 0
+        self.done = threading.Event()
+        self.lines = None
+        self.error = None
+
+__all__ = ['SingleFlight']
@@ -0,0 +1,117 @@
+r'''
+A pool of SSH connections to a single Gerrit site.
+
+The pool presents the same interface as `GerritSSHClient` (``execute``,
+``connected`` and ``disconnect``), so a `Site` can use either one without
+caring which it has been given. Each call to `execute` checks out an idle
+connection, and the connection is returned to the pool when the caller
+closes the `SSHCommandResult`. If every connection is busy, the caller
+blocks until one is returned.
+
+This is an internal class. Clients obtain a pooled site by passing the
+``pool_size`` argument to the `Site` constructor::
+
+    site = gerritssh.Site('gerrit.example.com', pool_size=4).connect()
+
+'''
+
+import logging
+
+try:  # pragma: no cover
+    import queue  # Python 3
+except ImportError:  # pragma: no cover
+    import Queue as queue  # Python 2
+
+from gerritssh.borrowed import ssh
+
+
+_logger = logging.getLogger(__name__)
+
+
+class SSHConnectionPool(object):
+    '''
+    A fixed-size, thread-safe pool of `GerritSSHClient` connections.
+
+    :param size: The number of connections to maintain
+    :param hostname: The host to connect to
+    :param username: The optional user name to use on connection
+    :param port: The optional port to use
+    :param keyfile_name: The optional key file to use
+
+    :raises: `ValueError` if size is less than one
+
+    '''
+
+    def __init__(self, size, hostname, username=None, port=None,
+                 keyfile_name=None):
+        if size < 1:
+            raise ValueError('Pool size must be at least one')
+
+        self.__clients = [ssh.GerritSSHClient(hostname, username, port,
+                                              keyfile_name)
+                          for _ in range(size)]
+        self.__idle = queue.Queue()
+        for client in self.__clients:
+            self.__idle.put(client)
+
+    def __repr__(self):
+        return ('<gerritssh.internal.sshpool.SSHConnectionPool('
+                'size=%d, idle=%d)>' % (self.size, self.__idle.qsize()))
+
+    @property
+    def size(self):
+        ''' The number of connections managed by the pool '''
+        return len(self.__clients)
+
+    def warm_up(self):
+        '''
+        Establish every connection in the pool which is not already open.
+
+        :returns: self to allow chaining
+        :raises: `SSHException` if any connection fails
+
+        '''
+        for client in self.__clients:
+            client._connect()
+        return self
+
+    def execute(self, command):
+        '''
+        Run a command on the next idle connection.
+
+        The connection is held until `close` is called on the returned
+        result.
+
+        :returns: an `SSHCommandResult`
+        :raises: `SSHException` if command execution fails
+
+        '''
+        client = self.__idle.get()
+        _logger.debug('Checked out %r for: %s' % (client, command))
+
+        try:
+            result = client.execute(command)
+        except BaseException:
+            self.__idle.put(client)
+            raise
+
+        result.add_close_callback(lambda: self.__idle.put(client))
+        return result
+
+    @property
+    def connected(self):
+        ''' True if any connection in the pool is open '''
+        return any(client.connected for client in self.__clients)
+
+    def disconnect(self):
+        '''
+        Close every open connection in the pool
+
+        :returns: self to allow chaining
+
+        '''
+        for client in self.__clients:
+            client.disconnect()
+        return self
+
+__all__ = ['SSHConnectionPool']
@@ -41,9 +41,9 @@ class ListGroups(SiteCommand):
         '''
 
         self.check_support_for(the_site)
-        raw = the_site.execute(' '.join(['ls-groups',
-                                        str(self._parsed_options)]
-                                        ).strip())
+        raw = the_site.execute_stream(' '.join(['ls-groups',
+                                                str(self._parsed_options)]
+                                               ).strip())
         self._results = [l for l in raw if l]
         return self._results
 
@@ -62,18 +62,19 @@ class ListMembers(SiteCommand):
                         str(self._parsed_options),
                         self.__group]
                        ).strip()
-        raw = the_site.execute(cmd)
+        raw = the_site.execute_stream(cmd)
+        header = next(raw, None)
 
-        if not raw:
+        if not header:
             raise InvalidGroupError('No Results from Command: ' + cmd)
 
-        if not raw[0].startswith('id\t'):
-            raise InvalidGroupError('Error from command: ' + raw[0])
+        if not header.startswith('id\t'):
+            raise InvalidGroupError('Error from command: ' + header)
 
         field_names = ['id', 'username', 'fullname', 'email']
         # The heavy use of list(..list()) here is a 2to3 thing
         self._results = [dict(list(zip(field_names, member.split('\t'))))
-                         for member in raw[1:]]
+                         for member in raw]
         return self._results
 
 __all__ = ['ListMembers', 'InvalidGroupError']
@@ -22,10 +22,21 @@ of a command are supported only in specific versions of Gerrit.
 
 '''
 
+import abc
+import collections
 import logging
+import threading
+import time
+
+try:  # pragma: no cover
+    import queue  # Python 3
+except ImportError:  # pragma: no cover
+    import Queue as queue  # Python 2
 
 from . import review
 from .gerritsite import SiteCommand
+from .governor import command_priority, current_priority
+from .internal import jsonlines
 from .internal.cmdoptions import *  # noqa
 
 _logger = logging.getLogger(__name__)
@@ -50,6 +61,9 @@ class Query(SiteCommand):
                * --commit-message
                * --format JSON
 
+               unless `fields` is given, in which case only --format JSON
+               and the options needed for those fields are added.
+
     :param query:
         arguments to the query commands, e.g. 'status:abandoned owner:self'
 
@@ -59,11 +73,83 @@ class Query(SiteCommand):
         Gerrit site, as Gerrit instances often have a built-in limit to the
         number of results it returns (often around 500).
 
+    :param prefetch:
+        The number of pages which may be fetched ahead of the caller. With
+        the default of zero, each page is only requested once the previous
+        one has been consumed. Otherwise, a background thread requests the
+        next page as soon as the current one has been read, and up to
+        `prefetch` decoded pages are buffered, hiding the network latency
+        behind the caller's own processing.
+
+    :param page_size:
+        The number of results to request in each page. If not given, the
+        server's default page size is used.
+
+        Gerrit 2.9 and later page by offset (the --start option) rather
+        than by sortKey. There, a fixed page size means the offset of every
+        page is known before any are received, and `prefetch` pages are
+        requested in parallel. If the server returns fewer results than
+        were asked for, without reaching the end, the page size is reduced
+        to match and the remaining offsets are planned again.
+
+    :param fields:
+        An optional iterable of the names of the JSON fields the caller
+        needs, e.g. ['subject', 'owner', 'status']. Gerrit always returns
+        the basic fields of a change, but computing and sending the patch
+        sets, approvals, dependencies and commit message is expensive. If
+        fields is given, only the options needed to return the fields named
+        are sent, rather than all of them. The optional fields are:
+
+        * currentPatchSet (--current-patch-set)
+        * patchSets (--patch-sets)
+        * approvals (--all-approvals)
+        * dependsOn, neededBy (--dependencies)
+        * commitMessage (--commit-message)
+        * comments (--comments)
+        * submitRecords (--submit-records)
+        * allReviewers (--all-reviewers)
+
+        Other names are taken to be basic fields, needing no option. The
+        properties of the resulting `Review` objects return None where
+        the fields they need are missing.
+
+    :param target_latency:
+        If given, the page size is adapted to the site, aiming for each
+        page to take about this many seconds to arrive. The time spent
+        waiting for the rows of each page, and their size, are measured,
+        and the size of the next page is chosen from the rate observed.
+        The size may at most double or halve from one page to the next,
+        and pages are also kept to a few megabytes. If the server returns
+        fewer rows than requested, without reaching the end, its limit is
+        remembered and never exceeded again. The first page requests
+        `page_size` rows, or 100 if it is not given.
+
+    :param keep_raw:
+        If False, each `Review` keeps only its commonly used fields rather
+        than all of the raw JSON, to save memory when many results are
+        held. See `Review` for the fields kept.
+
+    :param intern:
+        If True, the repeated strings in each result, such as project and
+        branch names, user names and statuses, are interned as the result
+        is decoded, so that equal values share a single string. This saves
+        memory when many results are kept, at a small cost in decoding.
+
+    :param resume_key:
+        The sortKey of the last result already received, on a site older
+        than Gerrit 2.9, where results are paged by sortKey. The results
+        begin with the one following it. This serves the same purpose as
+        the --start option on later sites.
+
+    :raises: `ValueError`
+        if prefetch, page_size or target_latency is negative, or the value
+        given for --start is not a non-negative integer
+
     '''
 
     __options = OptionSet(
         Option.choice('format', choices=['json', 'text']),
-        Option.flag('current-patchset'),
+        Option.flag('current-patch-set'),
         Option.flag('patch-sets'),
         Option.flag('all-approvals'),
         Option.flag('files'),
@@ -71,17 +157,54 @@ class Query(SiteCommand):
         Option.flag('dependencies'),
         Option.flag('submit-records', spec='>=2.5'),
         Option.flag('commit-message', spec='>=2.5'),
-        Option.flag('all-reviewers', spec='>=2.9')
+        Option.flag('all-reviewers', spec='>=2.9'),
+        Option.valued('start', 'S', spec='>=2.9')
         )
 
     __supported_versions = '>=2.4'
 
-    def __init__(self, option_str='', query='', max_results=0):
+    def __init__(self, option_str='', query='', max_results=0, prefetch=0,
+                 page_size=0, fields=None, target_latency=0,
+                 keep_raw=True, intern=False, resume_key=''):
+        if prefetch < 0:
+            raise ValueError('prefetch must not be negative')
+
+        if page_size < 0:
+            raise ValueError('page_size must not be negative')
+
+        if target_latency < 0:
+            raise ValueError('target_latency must not be negative')
+
         self.__query = query
         self.__max_results = max_results
+        self.__prefetch = prefetch
+        self.__page_size = page_size
+        self.__target_latency = target_latency
+        self.__keep_raw = keep_raw
+        self.__intern = intern
+        self.__resume_key = resume_key
+        self.__pager = None
+        if fields is None:
+            self.__required = _DEFAULT_OPTIONS
+        else:
+            self.__required = set(opt
+                                  for f in fields
+                                  for opt in _FIELD_OPTIONS.get(f, ()))
         super(Query, self).__init__(Query.__supported_versions,
                                     Query.__options,
                                     option_str)
+        # The pager supplies the offset for each page itself, so the
+        # value given for --start is removed from the parsed options.
+        opts = self._parsed_options
+        try:
+            self.__start = int(opts.start or 0)
+        except ValueError:
+            self.__start = -1
+
+        if self.__start < 0:
+            raise ValueError('--start must be a non-negative integer')
+
+        opts.start = None
 
     def execute_on(self, the_site):
         '''
@@ -91,46 +214,607 @@ class Query(SiteCommand):
 
         :returns: A list of GerritReview objects converted from returned JSON
 
+        '''
+        self._results = list(self.iter_execute(the_site))
+        return self._results
+
+    @property
+    def page_stats(self):
+        '''
+        The statistics returned with each page by the most recent execution
+
+        Gerrit ends each page of results with a line of statistics. These
+        are returned as dictionaries, in page order, with the keys
+        rowCount, runTimeMilliseconds and, from Gerrit 2.9, moreChanges.
+        A page abandoned before its statistics were read, such as when
+        max_results is reached part way through it, is not included.
+
+        '''
+        return list(self.__pager.stats) if self.__pager else []
+
+    @property
+    def row_count(self):
+        ''' The total rowCount of all the pages in `page_stats` '''
+        return sum(s.get('rowCount', 0) for s in self.page_stats)
+
+    @property
+    def run_time_ms(self):
+        '''
+        The total time, in milliseconds, the server reported spending on
+        the pages in `page_stats`
+        '''
+        return sum(s.get('runTimeMilliseconds', 0) for s in self.page_stats)
+
+    def iter_execute(self, the_site):
+        '''
+        Perform a Gerrit query command, yielding the results as they arrive.
+
+        Each `Review` is yielded as soon as its line of JSON is decoded,
+        and no reference to it is kept, so arbitrarily large result sets
+        can be processed with bounded memory. Pages are fetched from the
+        site one at a time, as the previous page is consumed.
+
+        Unlike `execute_on`, the results are not stored in the command
+        object, so iterating over the command afterwards will not return
+        them.
+
+        Unless `prefetch` is used, the channel carrying the current page
+        stays open, holding one of the site's channels, until that page
+        has been consumed. On a site created with max_channels=1, or whose
+        connection pool is exhausted, executing another command on the
+        same site from inside the loop will therefore block forever.
+        Either give the site room for a second command, pass a `prefetch`
+        depth so that each page is read in full before it is yielded, or
+        collect the results first with `execute_on`.
+
+        :param the_site: A `Site` object on which to execute the command
+
+        :returns: An iterator over `Review` objects
+
+        :raises: `NotImplementedError`
+            If the site does not support the command or one of its options.
+            This is raised immediately, not when iteration begins.
+
+        Usage::
+
+            for r in gerritssh.Query(query='status:merged').iter_execute(s):
+                print(r.number, r.summary)
+
         '''
         # Set the options we require in order to parse the results.
         opts = self._parsed_options
-        opts.current_patch_set = True
-        opts.patch_sets = True
-        opts.all_approvals = True
-        opts.dependencies = True
-        opts.commit_message = True
+        for key in self.__required:
+            setattr(opts, key, True)
         opts.format = 'JSON'
         self.check_support_for(the_site)
 
-        result = []
-        resume_key = ''
-        remaining = self.__max_results
-
-        def partial_query():
-            '''Helper to perform a single sub-query'''
-            resume = ('resume_sortkey:{0}'.format(resume_key)
-                      if resume_key else '')
-            standard_flags = ' '.join([str(opts), resume])
-            limit = 'limit:{0}'.format(remaining) if self.__max_results else ''
-            raw = the_site.execute(' '.join(['query', limit,
-                                             self.__query,
-                                             standard_flags]))
-            lines = self.text_to_json(raw)
-            return ([review.Review(l) for l in lines[:-1]]
-                    if len(lines) > 1 else [])
-
-        while self.__max_results == 0 or len(result) < self.__max_results:
-            partial = partial_query()
-            if not partial: break
-            result.extend(partial)
-            resume_key = partial[-1].raw['sortKey']
-            remaining -= len(partial)
-
-        self._results = (result[:self.__max_results]
-                         if (self.__max_results and
-                             len(result) > self.__max_results)
-                         else result)
-        return self._results
+        if self.__start and not the_site.version_in(_OFFSET_PAGING):
+            _logger.debug('--start not supported')
+            raise NotImplementedError(
+                'Gerrit version {0} does not support '
+                'one or more options provided'.format(the_site.version))
+
+        if self.__resume_key and the_site.version_in(_OFFSET_PAGING):
+            _logger.debug('resume_key not supported')
+            raise NotImplementedError(
+                'Gerrit version {0} pages by offset, so resume_key is '
+                'not supported. Use --start instead'.format(
+                    the_site.version))
+
+        self.__pager = self.__pager_for(the_site)
+        return self.__iter_reviews(the_site, opts, self.__pager)
+
+    def __pager_for(self, the_site):
+        '''
+        Choose the paging strategy supported by the site.
+
+        Gerrit 2.9 introduced the --start option for paging by offset, and
+        later versions removed the sortKey field, so offsets are used
+        wherever they are supported.
+
+        '''
+        page_size, sizer = self.__page_size, None
+        if self.__target_latency:
+            page_size = page_size or _INITIAL_PAGE_SIZE
+            sizer = _PageSizer(self.__target_latency, page_size)
+
+        if the_site.version_in(_OFFSET_PAGING):
+            return _OffsetPager(self.__max_results, page_size, sizer,
+                                self.__start)
+
+        return _SortKeyPager(self.__max_results, page_size, sizer,
+                             self.__resume_key)
+
+    def __iter_reviews(self, the_site, opts, pager):
+        '''
+        Generator which performs as many sub-queries as needed
+        '''
+        if pager.parallel and self.__prefetch:
+            pages = self.__parallel_pages(the_site, opts, pager)
+        elif self.__prefetch:
+            pages = self.__prefetch_pages(the_site, opts, pager)
+        else:
+            pages = self.__pages(the_site, opts, pager)
+
+        for page in pages:
+            for raw in page:
+                yield review.Review(raw, self.__keep_raw)
+
+    def __pages(self, the_site, opts, pager):
+        '''
+        Generator yielding each page as it is requested.
+
+        Each page is itself an iterator over the rows as they are read from
+        the site, and must be consumed before the next page is requested.
+
+        '''
+        while not pager.finished:
+            terms = pager.query_terms()
+            record = _PageRecord()
+            rows = self.__partial_query(the_site, opts, terms, record)
+            yield pager.counted(rows, terms, record)
+
+    def __prefetch_pages(self, the_site, opts, pager):
+        '''
+        Generator yielding each page as a list of rows, with the pages
+        fetched ahead of the caller by a background thread.
+
+        '''
+        pages = queue.Queue(self.__prefetch)
+        stop = threading.Event()
+        priority = current_priority()
+
+        def put(item):
+            ''' Queue an item, unless the consumer has gone away '''
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch():
+            ''' Fetch every page into the queue, then a sentinel '''
+            try:
+                with command_priority(priority):
+                    while not (pager.finished or stop.is_set()):
+                        terms = pager.query_terms()
+                        record = _PageRecord()
+                        rows = self.__partial_query(the_site, opts, terms,
+                                                    record)
+                        page = list(pager.counted(rows, terms, record))
+                        if page and not put(page):
+                            return
+            except Exception as e:
+                _logger.debug('Prefetch failed: {0}'.format(e))
+                put(e)
+            put(None)
+
+        fetcher = threading.Thread(target=fetch)
+        fetcher.daemon = True
+        fetcher.start()
+
+        try:
+            while True:
+                page = pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            stop.set()
+
+    def __parallel_pages(self, the_site, opts, pager):
+        '''
+        Generator yielding each page as a list of rows, with up to
+        `prefetch` pages being fetched at once.
+
+        Only possible when the offset of every page is known in advance.
+        The pages are still returned in order. If the pager has to plan the
+        offsets again, any pages already requested are discarded.
+
+        '''
+        pending = collections.deque()
+        priority = current_priority()
+
+        def start(terms):
+            ''' Fetch one page in a new thread '''
+            outcome = {'record': _PageRecord()}
+
+            def fetch():
+                try:
+                    with command_priority(priority):
+                        outcome['rows'] = list(
+                            self.__partial_query(the_site, opts, terms,
+                                                 outcome['record']))
+                except Exception as e:
+                    _logger.debug('Page fetch failed: {0}'.format(e))
+                    outcome['error'] = e
+
+            fetcher = threading.Thread(target=fetch)
+            fetcher.daemon = True
+            fetcher.start()
+            pending.append((fetcher, terms, outcome))
+
+        while True:
+            while len(pending) < self.__prefetch and pager.can_request:
+                start(pager.query_terms())
+
+            if not pending:
+                return
+
+            fetcher, terms, outcome = pending.popleft()
+            fetcher.join()
+            if 'error' in outcome:
+                raise outcome['error']
+
+            yield list(pager.counted(outcome['rows'], terms,
+                                     outcome['record']))
+            if pager.finished:
+                return
+
+            if pager.replanned:
+                _logger.debug('Discarding {0} pages'.format(len(pending)))
+                for fetcher, _, _ in pending:
+                    fetcher.join()
+                pending.clear()
+                pager.replanned = False
+
+    def __partial_query(self, the_site, opts, terms, record):
+        '''
+        Generator to perform a single sub-query, yielding its rows as
+        dictionaries.
+
+        The trailing statistics line is not a review. It is copied into
+        the record instead, once the rows have been read. Any error line
+        is logged and skipped.
+
+        Only the time spent waiting for each line is recorded, not the
+        time the caller spends between rows.
+
+        :param terms: The paging terms supplied by the pager
+        :param record: A `_PageRecord` describing the page as it is read
+
+        '''
+        lines = iter(the_site.execute_stream(' '.join(['query', terms.limit,
+                                                       self.__query,
+                                                       str(opts),
+                                                       terms.position])))
+        while True:
+            waited = time.time()
+            line = next(lines, None)
+            record.seconds += time.time() - waited
+            if line is None:
+                return
+
+            record.size += len(line)
+            line = line.strip()
+            if not line:
+                continue
+
+            raw = jsonlines.loads(line)
+            if raw.get('type') == 'stats':
+                record.stats.update(raw)
+                continue
+
+            if 'type' in raw:
+                _logger.debug('Query returned {0}'.format(line))
+                continue
+
+            yield jsonlines.interned(raw) if self.__intern else raw
+
+
+# The first page size, and the limits, when adapting the page size
+_INITIAL_PAGE_SIZE = 100
+_MIN_PAGE_SIZE = 10
+_MAX_PAGE_BYTES = 8 * 1024 * 1024
+
+
+class _PageRecord(object):
+    '''
+    What was observed while reading one page: its statistics line, the
+    seconds spent waiting for its lines and their total size in bytes.
+
+    '''
+
+    def __init__(self):
+        self.stats = {}
+        self.seconds = 0.0
+        self.size = 0
+
+
+class _PageSizer(object):
+    '''
+    Chooses the size of each page from the rate at which earlier pages
+    arrived, aiming for each to take `target` seconds.
+
+    :param target: The number of seconds each page should take
+    :param size: The size of the first page
+
+    '''
+
+    def __init__(self, target, size):
+        self.target = target
+        self.size = size
+        self.limit = 0
+
+    def capped(self, limit):
+        ''' Record the most rows the server will return in a page '''
+        _logger.debug('Server page size limit is {0}'.format(limit))
+        self.limit = limit
+        self.size = min(self.size, limit)
+
+    def observed(self, rows, record):
+        '''
+        Adjust the size after receiving a page
+
+        :param rows: The number of rows in the page
+        :param record: The `_PageRecord` for the page
+
+        :returns: The size of the next page
+
+        '''
+        if not rows or record.seconds <= 0:
+            return self.size
+
+        ideal = rows * self.target / record.seconds
+        if record.size:
+            ideal = min(ideal, rows * _MAX_PAGE_BYTES / record.size)
+
+        size = max(self.size // 2, min(self.size * 2, int(ideal)),
+                   _MIN_PAGE_SIZE)
+        if self.limit:
+            size = min(size, self.limit)
+
+        _logger.debug('{0} rows in {1:.3f}s, next page {2} rows'.format(
+            rows, record.seconds, size))
+        self.size = size
+        return size
+
+
+# The options which enable each optional field of the query results, as
+# keys in the parsed options
+_FIELD_OPTIONS = {
+    'currentPatchSet': ('current_patch_set',),
+    'patchSets': ('patch_sets',),
+    'approvals': ('patch_sets', 'all_approvals'),
+    'dependsOn': ('dependencies',),
+    'neededBy': ('dependencies',),
+    'commitMessage': ('commit_message',),
+    'comments': ('comments',),
+    'submitRecords': ('submit_records',),
+    'allReviewers': ('all_reviewers',),
+    }
+
+# The options always sent when no fields are specified
+_DEFAULT_OPTIONS = frozenset(['current_patch_set', 'patch_sets',
+                              'all_approvals', 'dependencies',
+                              'commit_message'])
+
+# Gerrit versions which support paging with --start
+_OFFSET_PAGING = '>=2.9'
+
+
+class _PageTerms(collections.namedtuple('_PageTerms',
+                                        'limit position offset size')):
+    '''
+    The terms which select a single page of results.
+
+    limit is the 'limit:' search term, or empty. position is the search
+    term or option selecting where the page begins, or empty for the first
+    page. offset is the index of the first row of the page within the
+    results, and size is the number of rows requested, or zero if the
+    server decides.
+
+    '''
+
+
+# The unusual base class is the same version-agnostic way of declaring an
+# abstract base class as is used for SiteCommand.
+
+class _Pager(abc.ABCMeta('newbase', (object,), {})):
+    '''
+    Tracks progress through the pages of a query.
+
+    Gerrit returns results in pages. A pager builds the terms for the next
+    request, counts the rows as they are consumed and determines when there
+    are no more pages to fetch. Sub-classes implement the different ways of
+    selecting the next page.
+
+    Rows must be passed through `counted` in the order they were returned,
+    one page at a time. The statistics line of each page counted is kept
+    in `stats`.
+
+    The last page is recognized by being empty, or by the moreChanges field
+    of its statistics line being false. The number of rows in a page is no
+    guide, as the server may return fewer than were asked for.
+
+    :param max_results: The maximum number of rows wanted, or zero for all
+    :param page_size:
+        The number of rows to request per page, or zero to let the server
+        decide.
+    :param sizer:
+        A `_PageSizer` which adapts the page size after each page, or None
+        to keep it fixed.
+
+    '''
+
+    # Can more pages be requested before the current one has been counted
+    parallel = False
+
+    def __init__(self, max_results, page_size=0, sizer=None):
+        self.max_results = max_results
+        self.page_size = page_size
+        self.sizer = sizer
+        self.count = 0
+        self.finished = False
+        self.replanned = False
+        self.stats = []
+
+    @property
+    def full(self):
+        ''' Have max_results rows been received '''
+        return bool(self.max_results) and self.count >= self.max_results
+
+    @property
+    def can_request(self):
+        ''' May another page be requested now '''
+        return not self.finished
+
+    def page_terms(self, offset, position):
+        '''
+        Build the terms for a page starting at offset, limited by the page
+        size and by the number of rows still wanted.
+
+        '''
+        limits = [self.page_size]
+        if self.max_results:
+            limits.append(self.max_results - offset)
+
+        limits = [n for n in limits if n]
+        size = min(limits) if limits else 0
+        return _PageTerms('limit:{0}'.format(size) if size else '',
+                          position, offset, size)
+
+    @abc.abstractmethod
+    def query_terms(self):
+        '''
+        The terms for the next request
+
+        :returns: A `_PageTerms` instance
+
+        '''
+
+    def add(self, raw):
+        ''' Record a row received in the current page '''
+        self.count += 1
+
+    def short_page(self, terms, page_count):
+        '''
+        Called when a page held fewer rows than were requested, but was
+        not the last. By default there is nothing to do.
+
+        '''
+        pass
+
+    def counted(self, rows, terms, record):
+        '''
+        Generator which passes on the rows of one page, recording each and
+        stopping once max_results has been reached. When the page is
+        exhausted, determine whether it was the last.
+
+        :param rows: The rows of the page
+        :param terms: The terms with which the page was requested
+        :param record:
+            The `_PageRecord` for the page. It is only complete once `rows`
+            is exhausted.
+
+        '''
+        page_count = 0
+        for raw in rows:
+            self.add(raw)
+            page_count += 1
+            yield raw
+            if self.full:
+                break
+
+        stats = record.stats
+        if stats:
+            _logger.debug('Page statistics: {0}'.format(stats))
+            self.stats.append(stats)
+
+        # Gerrit 2.9 and later say whether there are more results, saving
+        # the request for an empty page which older versions need.
+        self.finished = (self.full or not page_count or
+                         stats.get('moreChanges') is False)
+
+        if self.finished:
+            return
+
+        short = terms.size and page_count < terms.size
+        if short and self.sizer:
+            self.sizer.capped(page_count)
+
+        if self.sizer and stats:
+            self.page_size = self.sizer.observed(page_count, record)
+
+        if short:
+            self.short_page(terms, page_count)
+
+
+class _SortKeyPager(_Pager):
+    '''
+    Pages by quoting the sortKey of the last row of the previous page,
+    which is the only method available before Gerrit 2.9.
+
+    :param resume_key: The sortKey to resume from, if any
+
+    '''
+
+    def __init__(self, max_results, page_size=0, sizer=None, resume_key=''):
+        super(_SortKeyPager, self).__init__(max_results, page_size, sizer)
+        self.resume_key = resume_key
+
+    def query_terms(self):
+        resume = ('resume_sortkey:{0}'.format(self.resume_key)
+                  if self.resume_key else '')
+        return self.page_terms(self.count, resume)
+
+    def add(self, raw):
+        super(_SortKeyPager, self).add(raw)
+        self.resume_key = raw['sortKey']
+
+
+class _OffsetPager(_Pager):
+    '''
+    Pages with the --start option.
+
+    When the page size is fixed, the offset of every page is known in
+    advance, so pages may be requested before the earlier ones have been
+    received.
+
+    :param start: The offset of the first row wanted
+
+    '''
+
+    def __init__(self, max_results, page_size=0, sizer=None, start=0):
+        super(_OffsetPager, self).__init__(max_results, page_size, sizer)
+        self.start = start
+        self.requested = 0
+
+    @property
+    def parallel(self):
+        return bool(self.page_size)
+
+    @property
+    def can_request(self):
+        return not (self.finished or
+                    (self.max_results and
+                     self.requested >= self.max_results))
+
+    def query_terms(self):
+        offset = self.requested if self.parallel else self.count
+        self.requested = offset + self.page_size
+        position = self.start + offset
+        return self.page_terms(offset,
+                               '--start {0}'.format(position)
+                               if position else '')
+
+    def short_page(self, terms, page_count):
+        '''
+        The server limits pages to fewer rows than the page size, so any
+        pages requested in advance leave gaps. Shrink the page size to the
+        server's limit and plan again from the rows actually received.
+
+        '''
+        if self.parallel:
+            _logger.debug('Page size reduced from {0} to {1}'.format(
+                self.page_size, page_count))
+            self.page_size = min(self.page_size, page_count)
+            self.requested = self.count
+            self.replanned = True
 
 
 def _reviews_by_status(project, branch, max_results, status):
@@ -0,0 +1,442 @@
+r'''
+A cache of the output of read-only commands, invalidated by site events
+or by age.
+
+Tools which run the same listings again and again, such as bots checking
+the members of a group before every action, spend most of their SSH
+traffic fetching output which has not changed. A `ResponseCache` given to
+a `Site` keeps the output of each ``ls-projects``, ``ls-groups``,
+``ls-members``, ``query`` and ``version`` command, keyed by its command
+line, and returns it again when the same command is repeated. Every
+`SiteCommand` which reads those commands, such as `ProjectList` or `Query`,
+benefits without change. Only commands which do not change the site can
+be cached, so ``ban-commit``, for example, is always sent.
+
+Entries can expire after a time to live, set for all commands or for
+each one, and the least recently used entries are evicted to keep the
+cache within a number of entries or a size::
+
+    cache = gerritssh.ResponseCache(ttl={'query': 5, 'ls-projects': 300},
+                                    max_entries=1000, max_bytes=2 ** 26)
+
+Entries can also be removed as soon as the site reports an event which
+may have changed them, so they need not expire at all. `follow`
+subscribes to the site's events with an `EventStream`::
+
+    import gerritssh
+
+    cache = gerritssh.ResponseCache()
+    site = gerritssh.Site('gerrit.example.com', cache=cache).connect()
+    cache.follow(site)
+
+    members = gerritssh.ListMembers('Developers').execute_on(site)
+
+The events invalidate these entries:
+
+    ======================  ==============================================
+    Any change event        The queries whose project: and change: terms
+                            could match the change. A query without such
+                            terms, or using OR or negation, matches every
+                            change.
+    ref-updated             The project listings, unless only a change ref
+                            was updated. The group listings and members,
+                            if a group ref in All-Users was updated.
+    project-created         The project listings
+    Missed events           Everything, as soon as the followed stream
+                            fails or ends, and again when the
+                            `EventStream` reports an `EventGap`
+    ======================  ==============================================
+
+While a followed stream is interrupted, or after it has given up, events
+may be being missed, so commands are sent to the site and their output is
+not stored.
+
+Gerrit only reports changes to groups as updates of refs in All-Users
+from version 2.16 onwards. On older sites, call `invalidate` after
+changing a group.
+
+'''
+
+import collections
+import logging
+import re
+import threading
+import time
+
+from .eventstream import EventGap, EventStream
+from .gerritsite import _READ_ONLY_COMMANDS
+
+_logger = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+    '''
+    Keep the output of read-only commands until it expires, is evicted or
+    an event invalidates it
+
+    The cache is safe to share between threads, and between the copies of
+    a `Site`.
+
+    :param ttl:
+        The seconds for which an entry is kept. Either a number for every
+        command, or a dictionary mapping command names to numbers, in which
+        case the entries for other commands do not expire. By default,
+        entries are kept until they are evicted or invalidated.
+
+    :param max_entries:
+        The most entries kept. If omitted, the number is not limited.
+
+    :param max_bytes:
+        The most characters of output kept, over all entries. If omitted,
+        the size is not limited. Output larger than this is not cached.
+
+    :param commands:
+        The names of the commands to cache, from 'ls-projects',
+        'ls-groups', 'ls-members', 'query' and 'version'. All of them are
+        cached by default.
+
+    :raises:
+        `ValueError` if commands names a command which is not read-only,
+        or if a limit is less than one
+
+    '''
+
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None,
+                 commands=_READ_ONLY_COMMANDS):
+        commands = frozenset(commands)
+        if not commands <= _READ_ONLY_COMMANDS:
+            raise ValueError('Only read-only commands can be cached, not: '
+                             '{0}'.format(', '.join(sorted(
+                                 commands - _READ_ONLY_COMMANDS))))
+
+        for limit in (max_entries, max_bytes):
+            if limit is not None and limit < 1:
+                raise ValueError('Cache limits must be at least one')
+
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__commands = commands
+        self.__lock = threading.Lock()
+        self.__entries = collections.OrderedDict()
+        self.__bytes = 0
+        self.__pending = set()
+        self.__stream = None
+        self.__hits = 0
+        self.__misses = 0
+        self.__invalidations = 0
+        self.__evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def hits(self):
+        ''' The number of commands answered from the cache '''
+        return self.__hits
+
+    @property
+    def misses(self):
+        ''' The number of cacheable commands sent to the site '''
+        return self.__misses
+
+    @property
+    def invalidations(self):
+        ''' The number of entries removed by events or `invalidate` '''
+        return self.__invalidations
+
+    @property
+    def evictions(self):
+        ''' The number of entries removed as they expired or to make room '''
+        return self.__evictions
+
+    @property
+    def size(self):
+        ''' The number of characters of output held '''
+        return self.__bytes
+
+    def cacheable(self, cmd):
+        ''' Is the output of a command line kept by the cache '''
+        return _command_name(cmd) in self.__commands
+
+    def fetch(self, cmd, execute):
+        '''
+        The output of a command, from the cache if possible
+
+        This is called by `Site`, rather than by clients of the cache.
+
+        :param str cmd: The command line, without the 'gerrit' prefix
+        :param execute:
+            A function which runs the command on the site, returning an
+            iterator over its output lines
+
+        :returns:
+            An iterator over the output lines. When the command is run,
+            its output is stored once the iterator is exhausted, unless an
+            event invalidated the command meanwhile.
+
+        '''
+        if not self.cacheable(cmd):
+            return execute(cmd)
+
+        if self.__missing_events():
+            # Nothing held can be trusted, nor anything fetched now
+            self.invalidate()
+            with self.__lock:
+                self.__misses += 1
+            return execute(cmd)
+
+        key = _normalized(cmd)
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None and entry.expired():
+                self.__discard(entry)
+                self.__evictions += 1
+            elif entry is not None:
+                # Reinserting the entry marks it as the most recently used
+                self.__entries[key] = entry
+                self.__hits += 1
+                return iter(entry.lines)
+
+            self.__misses += 1
+            pending = _Pending(key)
+            self.__pending.add(pending)
+
+        return self.__store_after(pending, execute(cmd))
+
+    def __store_after(self, pending, output):
+        ''' Generator passing on output, and storing it once complete '''
+        lines = []
+        try:
+            for line in output:
+                lines.append(line)
+                yield line
+        finally:
+            with self.__lock:
+                self.__pending.discard(pending)
+
+        missing_events = self.__missing_events()
+        with self.__lock:
+            if pending.valid and not missing_events:
+                self.__store(pending.key, lines)
+
+    def __store(self, key, lines):
+        ''' Add an entry, evicting the least recently used to make room '''
+        ttl = self.__ttl
+        if isinstance(ttl, dict):
+            ttl = ttl.get(_command_name(key))
+
+        entry = _Entry(lines, ttl)
+        if self.__max_bytes is not None and entry.size > self.__max_bytes:
+            return
+
+        old = self.__entries.pop(key, None)
+        if old is not None:
+            self.__discard(old)
+
+        self.__entries[key] = entry
+        self.__bytes += entry.size
+        while ((self.__max_entries is not None and
+                len(self.__entries) > self.__max_entries) or
+               (self.__max_bytes is not None and
+                self.__bytes > self.__max_bytes)):
+            _, oldest = self.__entries.popitem(last=False)
+            self.__discard(oldest)
+            self.__evictions += 1
+
+    def __missing_events(self):
+        ''' Could events of the followed site be being missed '''
+        stream = self.__stream
+        return stream is not None and (stream.interrupted or
+                                       not stream.running)
+
+    def __discard(self, entry):
+        ''' Account for an entry which has been removed '''
+        self.__bytes -= entry.size
+
+    def invalidate(self, command=None):
+        '''
+        Remove entries from the cache
+
+        :param command:
+            The name of the command whose entries are removed, e.g.
+            'ls-groups'. If omitted, every entry is removed.
+
+        :returns: The number of entries removed
+
+        '''
+        return self.__remove(lambda key: (command is None or
+                                          _command_name(key) == command))
+
+    def apply(self, event):
+        '''
+        Remove the entries which an event may have changed
+
+        This is called for each event by `follow`. Clients which consume
+        an `EventStream` themselves can call it instead.
+
+        :param event: An `Event` or `EventGap`
+        :returns: The number of entries removed
+
+        '''
+        if isinstance(event, EventGap):
+            _logger.debug('Events were missed, clearing the cache')
+            return self.invalidate()
+
+        stale = set()
+        if event.type in ('ref-updated', 'project-created'):
+            ref = event.raw.get('refUpdate', {})
+            ref_name = ref.get('refName', '')
+            if not ref_name.startswith('refs/changes/'):
+                stale.add('ls-projects')
+            if (ref.get('project') == 'All-Users' and
+                    ref_name.startswith(('refs/groups/',
+                                         'refs/meta/group-names'))):
+                stale.update(['ls-groups', 'ls-members'])
+
+        change = event.raw.get('change')
+        return self.__remove(
+            lambda key: (_command_name(key) in stale or
+                         (change is not None and
+                          _command_name(key) == 'query' and
+                          _query_may_match(key, change))))
+
+    def follow(self, the_site, **stream_args):
+        '''
+        Invalidate entries as events are reported by a site
+
+        An `EventStream` is started on the site, and its events are
+        applied to the cache in a background thread until `unfollow` is
+        called. Whenever the stream is interrupted, the cache is cleared
+        and bypassed until it is connected again.
+
+        :param the_site: A connected `Site`
+        :param stream_args:
+            Any other keyword arguments are passed to the `EventStream`
+            constructor, e.g. ``reconnect_delay=5``
+
+        :returns: self to allow chaining
+
+        '''
+        self.unfollow()
+        stream = EventStream(the_site, **stream_args).start()
+        self.__stream = stream
+
+        def consume():
+            for event in stream:
+                self.apply(event)
+
+        thread = threading.Thread(target=consume,
+                                  name='gerritssh-cache-invalidation')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def unfollow(self):
+        '''
+        Stop following the events of a site
+
+        :returns: self to allow chaining
+
+        '''
+        if self.__stream is not None:
+            self.__stream.stop()
+            self.__stream = None
+        return self
+
+    def __remove(self, predicate):
+        ''' Remove the entries whose keys satisfy a predicate '''
+        with self.__lock:
+            for pending in self.__pending:
+                if predicate(pending.key):
+                    pending.valid = False
+
+            stale = [key for key in self.__entries if predicate(key)]
+            for key in stale:
+                self.__discard(self.__entries.pop(key))
+            self.__invalidations += len(stale)
+
+        if stale:
+            _logger.debug('Invalidated {0} entries'.format(len(stale)))
+        return len(stale)
+
+
+class _Entry(object):
+    ''' The output of a command, and when it expires '''
+
+    def __init__(self, lines, ttl):
+        self.lines = lines
+        self.size = sum(len(line) for line in lines)
+        self.expires = time.time() + ttl if ttl is not None else None
+
+    def expired(self):
+        return self.expires is not None and time.time() >= self.expires
+
+
+class _Pending(object):
+    '''
+    A command being fetched for the cache. It becomes invalid if an entry
+    for the command is invalidated before its output is complete, as the
+    output may already be out of date.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+        self.valid = True
+
+
+def _normalized(cmd):
+    ''' The command line with runs of white space replaced by one space '''
+    return ' '.join(cmd.split())
+
+
+def _command_name(cmd):
+    ''' The name of the command in a command line '''
+    return cmd.split(None, 1)[0] if cmd.strip() else ''
+
+
+def _query_may_match(cmd, change):
+    '''
+    Could the results of a query command include a change
+
+    Only the project: and change: terms are examined. Any other terms are
+    assumed to match, so a query may be invalidated needlessly, but never
+    missed. Queries which negate those terms, or use NOT or OR, always
+    match, as the terms may not have to hold.
+
+    '''
+    if _NEGATION_OR_ALTERNATIVE.search(cmd):
+        return True
+
+    projects = _terms('project', cmd)
+    if projects and not projects & set(['', change.get('project')]):
+        return False
+
+    changes = _terms('change', cmd)
+    if changes and not changes & set(['', str(change.get('number')),
+                                      change.get('id')]):
+        return False
+
+    return True
+
+
+def _terms(operator, cmd):
+    '''
+    The values of the terms in a command line using an operator, with
+    any quotes removed. A regular expression, which could match any value,
+    is returned as ''.
+    '''
+    values = set()
+    for value in re.findall(r'(?:^|[\s(]){0}:(\S+)'.format(operator), cmd):
+        value = value.strip('"\'{}()')
+        values.add('' if value.startswith('^') else value)
+    return values
+
+
+# Negated and alternative terms, which invert the meaning of project: and
+# change: terms, or make them optional
+_NEGATION_OR_ALTERNATIVE = re.compile(
+    r'(?:^|[\s(])(?:-(?:project:|change:|\()|(?:NOT|OR)[\s(])',
+    re.IGNORECASE)
+
+__all__ = ['ResponseCache']
@@ -20,6 +20,12 @@ return a field, without needing any manipulation.
 However, some properties such as the patchset number, are defined
 as explicit properties to allow conversion to a more natural type.
 
+A query may ask Gerrit for only some of the fields of each review (see
+the `fields` argument of `Query`). The explicit properties return None
+when the fields they are derived from were not returned, rather than
+raising an exception. Direct access to a missing field still raises
+AttributeError.
+
 As a note for contributors, it might seem to make sense to move
 these classes into the `query` module. But it is not difficult to
 envisage other modules which operate solely on collections of
@@ -59,6 +65,8 @@ class Patchset(object):
 
     '''
 
+    __slots__ = ('__parent_review', '__raw')
+
     def __init__(self, review, raw):
         if not isinstance(review, Review):
             raise TypeError('review must be of type gerritssh.Review')
@@ -78,13 +86,14 @@ class Patchset(object):
         :raises: AttributeError if `name` is not a key in the raw JSON.
 
         '''
-        try:
-            return self.__dict__[name]
-        except KeyError:
-            if self.__raw and name in self.__raw:
-                return self.__raw[name]
-            else:
-                raise AttributeError
+        # See Review.__getattr__
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        if name in self.__raw:
+            return self.__raw[name]
+
+        raise AttributeError(name)
 
     @property
     def raw(self):
@@ -100,19 +109,22 @@ class Patchset(object):
         '''
         Author of the Patchset
 
-        :returns: (str) The uploader's name if available, else their user name.
+        :returns:
+            (str) The uploader's name if available, else their user name,
+            or None if the uploader was not returned.
         '''
-        owner = self.raw['uploader']
-        return owner['name'] if 'name' in owner else owner['username']
+        return _person_name(self.raw.get('uploader'))
 
     @property
     def created_on(self):
         '''
         When was the Patchset created
 
-        :returns: (`datetime`) The date and time the patchset was created
+        :returns:
+            (`datetime`) The date and time the patchset was created, or None
+            if it was not returned.
         '''
-        return dt.datetime.fromtimestamp(self.raw['createdOn'])
+        return _timestamp(self.raw.get('createdOn'))
 
     @property
     def number(self):
@@ -125,6 +137,11 @@ class Review(object):
     A single code review, containing all patchsets
 
     :param raw: A dict() representing the raw JSON response from Gerrit
+    :param keep_raw:
+        If True (the default), the raw JSON is kept, and all of it remains
+        available. If False, only the commonly used fields are kept (see
+        below), and the rest of the raw JSON is released. This greatly
+        reduces the memory needed to hold many reviews.
 
     :raises: TypeError if raw is not a dictionary
 
@@ -132,28 +149,48 @@ class Review(object):
     so all instance variables are declared with double leading underscores
     and provided as properties with getters only
 
+    The commonly used fields, id, number, project, branch, status, owner,
+    subject, url, createdOn and lastUpdated, are held in slots rather than
+    an instance dictionary. So is the number, revision and ref of the
+    current patch set. Without the raw JSON, `raw` returns a dictionary
+    holding just those fields, and `patchsets` holds only the current
+    patch set.
+
     '''
 
-    def __init__(self, raw):
+    __slots__ = ('__raw', '__patchsets', '__host', '__highestPatchSetNumber',
+                 '__id', '__number', '__project', '__branch', '__status',
+                 '__owner', '__subject', '__url', '__created', '__updated',
+                 '__current')
+
+    def __init__(self, raw, keep_raw=True):
         if not isinstance(raw, dict):
             raise TypeError('raw must be a dictionary')
 
-        self.__raw = raw
-        self.__patchsets = {}
-        self.__host = urlp.urlsplit(self.url).netloc
-
-        if 'patchSets' in self.raw:
-            for p in self.raw['patchSets']:
-                ps = Patchset(self, p)
-                self.__patchsets[ps.number] = ps
-
-        # The JSON for the current patch set may contain more information
-        # than is returned in the patchSets object
-        if 'currentPatchSet' in self.raw:
-            cps = Patchset(self, self.raw['currentPatchSet'])
-            self.__patchsets[cps.number] = cps
-
-        self.__highestPatchSetNumber = max(self.patchsets.keys())
+        # Most users of a Review only read a few fields, so the patch sets
+        # and derived values are only worked out when first asked for.
+        self.__raw = raw if keep_raw else None
+        self.__patchsets = None
+        self.__host = _UNSET
+        self.__highestPatchSetNumber = _UNSET
+
+        self.__id = raw.get('id')
+        self.__number = raw.get('number')
+        self.__project = raw.get('project')
+        self.__branch = raw.get('branch')
+        self.__status = raw.get('status')
+        self.__owner = raw.get('owner')
+        self.__subject = raw.get('subject')
+        self.__url = raw.get('url')
+        self.__created = raw.get('createdOn')
+        self.__updated = raw.get('lastUpdated')
+
+        current = raw.get('currentPatchSet')
+        if current is not None and not keep_raw:
+            current = dict((k, current[k])
+                           for k in ('number', 'revision', 'ref')
+                           if k in current)
+        self.__current = current
 
     def __getattr__(self, name):
         '''
@@ -164,49 +201,79 @@ class Review(object):
         :raises: AttributeError if `name` is not a key in the raw JSON.
 
         '''
-        try:
-            return self.__dict__[name]
-        except KeyError:
-            if self.__raw and name in self.__raw:
-                return self.__raw[name]
-            else:
-                raise AttributeError
+        # Never a raw field, and looking up the raw JSON of an instance
+        # which is still being created (e.g. by copy) would recurse.
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        raw = self.raw
+        if name in raw:
+            return raw[name]
+
+        raise AttributeError(name)
 
     @property
     def host(self):
-        ''' The Gerrit host name, e.g. review.example.com '''
+        ''' The Gerrit host name, e.g. review.example.com, or None '''
+        if self.__host is _UNSET:
+            self.__host = urlp.urlsplit(self.__url or '').netloc or None
+
         return self.__host
 
+    def __raw_patchsets(self):
+        ''' The raw JSON of every patch set which was kept '''
+        raw_sets = list(self.__raw.get('patchSets', ())) if self.__raw else []
+
+        # The JSON for the current patch set may contain more information
+        # than is returned in the patchSets object, so it comes last
+        if self.__current is not None:
+            raw_sets.append(self.__current)
+
+        return raw_sets
+
     @property
     def patchsets(self):
         ''' List of Patch sets for this Review '''
+        if self.__patchsets is None:
+            patchsets = {}
+            for p in self.__raw_patchsets():
+                ps = Patchset(self, p)
+                patchsets[ps.number] = ps
+
+            self.__patchsets = patchsets
+
         return self.__patchsets
 
     @property
     def highest_patchset_number(self):
-        ''' Number of the latest Patch set in the Review '''
+        ''' Number of the latest Patch set in the Review, or None '''
+        if self.__highestPatchSetNumber is _UNSET:
+            # Read from the raw JSON, so no Patchset objects are needed
+            raw_sets = self.__raw_patchsets()
+            self.__highestPatchSetNumber = (
+                max(int(p['number']) for p in raw_sets) if raw_sets else None)
+
         return self.__highestPatchSetNumber
 
     @property
     def highest_patchset(self):
-        ''' The Patchset object for the current patch set '''
-        return self.patchsets[self.highest_patchset_number]
+        ''' The Patchset object for the current patch set, or None '''
+        return self.patchsets.get(self.highest_patchset_number)
 
     @property
     def author(self):
         ''' Author of the review. '''
-        owner = self.__raw['owner']
-        return owner['name'] if 'name' in owner else owner['username']
+        return _person_name(self.__owner)
 
     @property
     def created_on(self):
         ''' When the review was created '''
-        return dt.datetime.fromtimestamp(self.__raw['createdOn'])
+        return _timestamp(self.__created)
 
     @property
     def merged(self):
         ''' Has the change been merged '''
-        return self.raw['status'] == 'MERGED'
+        return self.__status == 'MERGED'
 
     @property
     def merged_on(self):
@@ -216,43 +283,93 @@ class Review(object):
     @property
     def last_updated_on(self):
         ''' When was the review last updated '''
-        return dt.datetime.fromtimestamp(self.raw['lastUpdated'])
+        return _timestamp(self.__updated)
 
     @property
     def age(self):
         ''' How old is the review as a timedelta '''
-        return (self.last_updated_on - self.created_on
-                if self.last_updated_on > self.created_on
+        updated, created = self.last_updated_on, self.created_on
+        if updated is None or created is None:
+            return None
+
+        return (updated - created if updated > created
                 else dt.timedelta(0, 0))
 
     @property
     def raw(self):
-        ''' The raw JSON received from Gerrit '''
-        return self.__raw
+        '''
+        The raw JSON received from Gerrit, or just its commonly used fields
+        if the rest was not kept
+        '''
+        if self.__raw is not None:
+            return self.__raw
+
+        fields = (('id', self.__id), ('number', self.__number),
+                  ('project', self.__project), ('branch', self.__branch),
+                  ('status', self.__status), ('owner', self.__owner),
+                  ('subject', self.__subject), ('url', self.__url),
+                  ('createdOn', self.__created),
+                  ('lastUpdated', self.__updated),
+                  ('currentPatchSet', self.__current))
+        return dict((k, v) for k, v in fields if v is not None)
+
+    @property
+    def keeps_raw(self):
+        ''' Was all of the raw JSON kept '''
+        return self.__raw is not None
 
     @property
     def summary(self):
         ''' Summary line of the commit message '''
-        return self.raw['subject']
+        return self.__subject
 
     @property
     def SHA1(self):  # noqa - Inhibit lowercase naming warning
         ''' SHA1 for the latest Patchset '''
-        return self.raw['currentPatchSet']['revision']
+        return (self.__current or {}).get('revision')
 
     @property
     def repo_name(self):
         ''' The name of the repository (including folders) '''
-        return self.raw['project']
+        return self.__project
 
     @property
     def number(self):
         ''' The review number a an integer '''
-        return int(self.raw['number'])
+        return int(self.__number) if self.__number is not None else None
 
     @property
     def ref(self):
         ''' The REF string for the review (REFS/CHANGES/...) '''
-        return self.highest_patchset.ref
+        ps = self.highest_patchset
+        return ps.raw.get('ref') if ps else None
+
+# Marks a lazily computed value which has not been computed yet
+_UNSET = object()
+
+
+def _person_name(person):
+    ''' The name of a user, else their user name, from the raw JSON '''
+    if not person:
+        return None
+
+    return person['name'] if 'name' in person else person.get('username')
+
+
+def _person_id(person):
+    '''
+    The string identifying a user in the raw JSON: their user name, else
+    their e-mail address, else their name
+    '''
+    if not person:
+        return None
+
+    return (person.get('username') or person.get('email') or
+            person.get('name'))
+
+
+def _timestamp(seconds):
+    ''' Convert a raw timestamp to a datetime, allowing it to be missing '''
+    return dt.datetime.fromtimestamp(seconds) if seconds is not None else None
 
 __all__ = ['Review', 'Patchset']
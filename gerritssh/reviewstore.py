@@ -0,0 +1,350 @@
+r'''
+A local SQLite store of reviews.
+
+Tools which ask many questions of the same reviews need not run a query
+over SSH for each one. A `ReviewStore` keeps the reviews returned by
+queries in an SQLite database, indexed by change number, Change-Id,
+project, branch, owner, status and last update time, and answers
+lookups locally::
+
+    import gerritssh
+
+    site = gerritssh.Site('gerrit.example.com').connect()
+    with gerritssh.ReviewStore('reviews.db') as store:
+        store.sync(site, 'project:tools/gerritssh')
+        for r in store.find(status='NEW', owner='jdoe'):
+            print(r.number, r.summary)
+
+`sync` only fetches the reviews updated since the previous sync of the
+same query, so it can be run often, and resumes an interrupted sync from
+its last checkpoint. The raw JSON of each review is
+stored, and the `Review` objects returned are rebuilt from it.
+
+'''
+
+import json
+import logging
+import sqlite3
+import time
+
+from .internal import jsonlines
+from .query import Query
+from .review import Review, _person_id
+
+_logger = logging.getLogger(__name__)
+
+
+class ReviewStore(object):
+    '''
+    Store reviews in an SQLite database
+
+    :param path:
+        The database file, which is created if necessary. The default
+        keeps the store in memory, for the lifetime of the object.
+
+    '''
+
+    def __init__(self, path=':memory:'):
+        self.__path = path
+        self.__db = sqlite3.connect(path)
+        with self.__db:
+            self.__db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.__db.execute('SELECT COUNT(*) FROM reviews').fetchone()[0]
+
+    @property
+    def path(self):
+        ''' The database file, or ':memory:' '''
+        return self.__path
+
+    @property
+    def watermark(self):
+        '''
+        The most recent lastUpdated time of any stored review, in seconds
+        since the epoch, or None if the store is empty
+        '''
+        return self.__db.execute(
+            'SELECT MAX(last_updated) FROM reviews').fetchone()[0]
+
+    def close(self):
+        ''' Close the database '''
+        self.__db.close()
+
+    def save(self, reviews):
+        '''
+        Store reviews, replacing any earlier copies of the same changes
+
+        All of the reviews are written in a single transaction.
+
+        :param reviews: An iterable of `Review` objects
+        :returns: The number of reviews stored
+        '''
+        count = 0
+        with self.__db:
+            for r in reviews:
+                self.__save_one(r)
+                count += 1
+
+        return count
+
+    def __save_one(self, r):
+        ''' Write one review and its patch sets '''
+        raw = r.raw
+        self.__db.execute(
+            'INSERT OR REPLACE INTO reviews VALUES (?,?,?,?,?,?,?,?,?)',
+            (r.number, raw.get('id'), raw.get('project'), raw.get('branch'),
+             _person_id(raw.get('owner')), raw.get('status'),
+             raw.get('createdOn'), raw.get('lastUpdated'),
+             json.dumps(raw)))
+
+        self.__db.execute('DELETE FROM patchsets WHERE number = ?',
+                          (r.number,))
+        self.__db.executemany(
+            'INSERT INTO patchsets VALUES (?,?,?,?,?,?)',
+            [(r.number, ps.number, ps.raw.get('revision'), ps.raw.get('ref'),
+              _person_id(ps.raw.get('uploader')), ps.raw.get('createdOn'))
+             for ps in r.patchsets.values()])
+
+    def get(self, number):
+        '''
+        :param int number: A change number
+        :returns: The stored `Review`, or None if it is not stored
+        '''
+        row = self.__db.execute('SELECT raw FROM reviews WHERE number = ?',
+                                (number,)).fetchone()
+        return Review(jsonlines.loads(row[0])) if row else None
+
+    def find(self, change_id=None, project=None, branch=None, owner=None,
+             status=None, updated_after=None, revision=None):
+        '''
+        Find stored reviews, most recently updated first
+
+        Each argument given restricts the results to the reviews matching
+        it, using the indexes of the store.
+
+        :param change_id: The Change-Id
+        :param project: The project name
+        :param branch: The branch name
+        :param owner: The owner's user name, else e-mail address, else name
+        :param status: The status, e.g. 'NEW' or 'MERGED'
+        :param updated_after:
+            Seconds since the epoch. Only reviews updated later are returned.
+        :param revision: The SHA1 of any patch set of the review
+
+        :returns: A list of `Review` objects
+
+        '''
+        terms, values = [], []
+        for column, value in (('change_id', change_id),
+                              ('project', project),
+                              ('branch', branch),
+                              ('owner', owner),
+                              ('status', status)):
+            if value is not None:
+                terms.append('{0} = ?'.format(column))
+                values.append(value)
+
+        if updated_after is not None:
+            terms.append('last_updated > ?')
+            values.append(updated_after)
+
+        if revision is not None:
+            terms.append('number IN (SELECT number FROM patchsets '
+                         'WHERE revision = ?)')
+            values.append(revision)
+
+        sql = 'SELECT raw FROM reviews'
+        if terms:
+            sql += ' WHERE ' + ' AND '.join(terms)
+
+        rows = self.__db.execute(sql + ' ORDER BY last_updated DESC', values)
+        return [Review(jsonlines.loads(raw)) for raw, in rows]
+
+    def sync(self, the_site, query='', option_str='', batch_size=500,
+             name=None):
+        '''
+        Fetch and store the reviews updated since the last sync
+
+        Each logical query, identified by `name`, has its own watermark:
+        the highest lastUpdated time of the reviews its completed syncs
+        have fetched. The first sync of a query fetches every review
+        matching it. Later syncs restrict the query with an '-age:' term to
+        the reviews updated since the watermark, less a margin to allow for
+        the clocks of the site and this machine differing. Reviews fetched
+        again are simply replaced.
+
+        The reviews are requested in pages of `batch_size`, and each page
+        is stored in a single transaction together with a checkpoint of
+        the position reached. If the sync is interrupted, by an error or a
+        dropped connection, the next sync of the same query resumes from
+        the checkpoint, with the same restriction on age, rather than
+        starting again. The position is an offset (the --start option)
+        on Gerrit 2.9 and later, and the sortKey of the last review stored
+        on earlier versions.
+
+        :param the_site: A connected `Site`
+        :param query: The search terms, e.g. 'project:tools/gerritssh'
+        :param option_str: Options for the query, as for `Query`
+        :param batch_size: The number of reviews stored per transaction
+        :param name:
+            Identifies the logical query. The default is the option string
+            and the query.
+
+        :returns: The number of reviews stored by this call
+
+        '''
+        name = name or ' '.join([option_str, query]).strip()
+        state = self.sync_state(name)
+        if state is None:
+            state = {'watermark': None, 'cutoff': None, 'position': None,
+                     'resume_key': None, 'run_watermark': None}
+
+        if state['position'] is None:
+            # Start a new run, restricted to the changes updated since the
+            # last completed one
+            watermark = state['watermark']
+            state.update(cutoff=(watermark - _SYNC_MARGIN
+                                 if watermark is not None else None),
+                         position=0, resume_key='', run_watermark=watermark)
+        else:
+            _logger.debug('Resuming sync of {0} from {1}'.format(
+                name, state['position']))
+
+        terms = [query]
+        if state['cutoff'] is not None:
+            age = max(int(time.time()) - state['cutoff'], 1)
+            terms.append('-age:{0}s'.format(age))
+
+        offset_paging = the_site.version_in('>=2.9')
+        if offset_paging and state['position']:
+            option_str = ' '.join([option_str,
+                                   '--start {0}'.format(state['position'])])
+
+        q = Query(option_str, ' '.join(terms).strip(), prefetch=1,
+                  page_size=batch_size,
+                  resume_key='' if offset_paging else state['resume_key'])
+        _logger.debug('Syncing {0} with: {1}'.format(name, ' '.join(terms)))
+
+        count, batch = 0, []
+        for r in q.iter_execute(the_site):
+            batch.append(r)
+            if len(batch) >= batch_size:
+                count += self.__save_page(name, state, batch)
+                batch = []
+
+        count += self.__save_page(name, state, batch)
+
+        # The run is complete, so the next starts from its watermark
+        state.update(watermark=state['run_watermark'], cutoff=None,
+                     position=None, resume_key=None)
+        with self.__db:
+            self.__save_state(name, state)
+
+        return count
+
+    def sync_state(self, name):
+        '''
+        The progress of the syncs of a logical query
+
+        :param name: The name of the query, as given to `sync`
+
+        :returns:
+            None if the query has never been synced. Otherwise a dictionary
+            holding the watermark of the last completed sync, and, if a
+            sync was interrupted, the cutoff time of its age restriction,
+            the number of reviews it stored (position), the sortKey of the
+            last of them (resume_key) and the highest lastUpdated seen
+            (run_watermark). The position is None if no sync is in
+            progress.
+
+        '''
+        row = self.__db.execute(
+            'SELECT watermark, cutoff, position, resume_key, run_watermark '
+            'FROM sync_state WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+
+        return dict(zip(['watermark', 'cutoff', 'position', 'resume_key',
+                         'run_watermark'], row))
+
+    def __save_page(self, name, state, reviews):
+        ''' Store a page of reviews and the checkpoint after it '''
+        if not reviews:
+            return 0
+
+        updated = [r.raw.get('lastUpdated') for r in reviews]
+        updated = [u for u in updated if u is not None]
+        if updated:
+            state['run_watermark'] = max([state['run_watermark'] or 0] +
+                                         updated)
+
+        state['position'] += len(reviews)
+        state['resume_key'] = reviews[-1].raw.get('sortKey', '')
+
+        with self.__db:
+            for r in reviews:
+                self.__save_one(r)
+            self.__save_state(name, state)
+
+        return len(reviews)
+
+    def __save_state(self, name, state):
+        ''' Write the sync state of a query '''
+        self.__db.execute(
+            'INSERT OR REPLACE INTO sync_state VALUES (?,?,?,?,?,?)',
+            (name, state['watermark'], state['cutoff'], state['position'],
+             state['resume_key'], state['run_watermark']))
+
+
+# Seconds added to the age of the watermark when syncing, to allow for
+# differences between the clocks of the site and this machine
+_SYNC_MARGIN = 60 * 60
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS reviews (
+    number INTEGER PRIMARY KEY,
+    change_id TEXT,
+    project TEXT,
+    branch TEXT,
+    owner TEXT,
+    status TEXT,
+    created_on INTEGER,
+    last_updated INTEGER,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_change_id ON reviews (change_id);
+CREATE INDEX IF NOT EXISTS reviews_project ON reviews (project, branch);
+CREATE INDEX IF NOT EXISTS reviews_branch ON reviews (branch);
+CREATE INDEX IF NOT EXISTS reviews_owner ON reviews (owner);
+CREATE INDEX IF NOT EXISTS reviews_status ON reviews (status);
+CREATE INDEX IF NOT EXISTS reviews_last_updated ON reviews (last_updated);
+
+CREATE TABLE IF NOT EXISTS patchsets (
+    number INTEGER NOT NULL,
+    patchset INTEGER NOT NULL,
+    revision TEXT,
+    ref TEXT,
+    uploader TEXT,
+    created_on INTEGER,
+    PRIMARY KEY (number, patchset)
+);
+CREATE INDEX IF NOT EXISTS patchsets_revision ON patchsets (revision);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    watermark INTEGER,
+    cutoff INTEGER,
+    position INTEGER,
+    resume_key TEXT,
+    run_watermark INTEGER
+);
+'''
+
+__all__ = ['ReviewStore']
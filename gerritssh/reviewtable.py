@@ -0,0 +1,245 @@
+r'''
+A columnar table of reviews, for analysis of large result sets.
+
+Processing a long history of reviews one `Review` object at a time is
+slow, as every property access converts the raw JSON again, e.g. each
+timestamp with datetime.fromtimestamp. A
+`ReviewTable` extracts the fields most used for metrics into NumPy
+arrays once, so that filtering, grouping and age calculations are
+performed on whole columns at a time::
+
+    import gerritssh
+
+    site = gerritssh.Site('gerrit.example.com').connect()
+    q = gerritssh.Query(query='after:2014-01-01', keep_raw=False)
+    table = gerritssh.ReviewTable(q.iter_execute(site))
+
+    merged = table.filter(table['status'] == 'MERGED')
+    for project, reviews in merged.group_by('project').items():
+        print(project, len(reviews), reviews.ages().mean())
+
+The table holds the following columns:
+
+    =========  =======================================================
+    number     The change number, as int64
+    created    The creation time, as datetime64[s] in UTC
+    updated    The last update time, as datetime64[s] in UTC
+    status     The status, as an `EncodedColumn`
+    project    The project name, as an `EncodedColumn`
+    owner      The owner's user name, else e-mail address, else name,
+               as an `EncodedColumn`
+    patchsets  The number of the highest patch set, as int32
+    =========  =======================================================
+
+Missing times are NaT, and missing strings are encoded as None.
+
+NumPy is an optional dependency of gerritssh. It is only needed to use
+this module, and a `ReviewTable` cannot be created without it.
+
+'''
+
+try:  # pragma: no cover
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .review import _person_id
+
+
+class EncodedColumn(object):
+    '''
+    A column of strings, dictionary-encoded as an array of integer codes
+    into a list of distinct labels
+
+    Comparing the column with a string, using ``==`` or ``!=``, returns a
+    boolean array suitable for `ReviewTable.filter`.
+
+    :param codes: An integer array with one code per row
+    :param labels: The label for each code
+
+    '''
+
+    def __init__(self, codes, labels):
+        self.codes = codes
+        self.labels = list(labels)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.labels[self.codes[index]]
+
+    def __iter__(self):
+        return iter(self.decoded())
+
+    def __eq__(self, label):
+        return self.codes == self.code(label)
+
+    def __ne__(self, label):
+        return self.codes != self.code(label)
+
+    __hash__ = None
+
+    def code(self, label):
+        ''' The code for a label, or -1 if it does not occur '''
+        try:
+            return self.labels.index(label)
+        except ValueError:
+            return -1
+
+    def isin(self, labels):
+        '''
+        :returns: A boolean array, true for rows holding any of the labels
+        '''
+        return np.isin(self.codes, [self.code(l) for l in labels])
+
+    def decoded(self):
+        ''' The column as a list of strings '''
+        return [self.labels[c] for c in self.codes]
+
+    def take(self, indices):
+        ''' A new column holding only the rows selected by indices '''
+        return EncodedColumn(self.codes[indices], self.labels)
+
+
+class ReviewTable(object):
+    '''
+    Columnar storage for many reviews
+
+    :param reviews:
+        An iterable of `Review` objects, such as the results of executing
+        a `Query`, or the iterator returned by `Query.iter_execute`. The
+        reviews are read once, and no reference to them is kept.
+
+    :raises: `ImportError` if NumPy is not installed
+
+    '''
+
+    # The columns which are dictionary encoded
+    __encoded = ('status', 'project', 'owner')
+
+    def __init__(self, reviews=()):
+        if np is None:
+            raise ImportError('ReviewTable requires numpy')
+
+        numbers, created, updated, patchsets = [], [], [], []
+        encoders = dict((name, {}) for name in ReviewTable.__encoded)
+        codes = dict((name, []) for name in ReviewTable.__encoded)
+
+        for r in reviews:
+            raw = r.raw
+            numbers.append(r.number or 0)
+            created.append(raw.get('createdOn'))
+            updated.append(raw.get('lastUpdated'))
+            patchsets.append(r.highest_patchset_number or 0)
+
+            values = (raw.get('status'), raw.get('project'),
+                      _person_id(raw.get('owner')))
+            for name, value in zip(ReviewTable.__encoded, values):
+                encoder = encoders[name]
+                codes[name].append(encoder.setdefault(value, len(encoder)))
+
+        columns = {
+            'number': np.array(numbers, dtype=np.int64),
+            'created': np.array(created, dtype='datetime64[s]'),
+            'updated': np.array(updated, dtype='datetime64[s]'),
+            'patchsets': np.array(patchsets, dtype=np.int32),
+            }
+        for name in ReviewTable.__encoded:
+            labels = sorted(encoders[name], key=encoders[name].get)
+            columns[name] = EncodedColumn(np.array(codes[name],
+                                                   dtype=np.int32),
+                                          labels)
+
+        self.__columns = columns
+
+    @classmethod
+    def _from_columns(cls, columns):
+        ''' Create a table directly from its columns '''
+        table = cls.__new__(cls)
+        table.__columns = columns
+        return table
+
+    def __len__(self):
+        return len(self.__columns['number'])
+
+    def __getitem__(self, name):
+        '''
+        :returns:
+            The named column, as an array or an `EncodedColumn`
+        :raises: `KeyError` if there is no such column
+        '''
+        return self.__columns[name]
+
+    @property
+    def columns(self):
+        ''' The names of the columns '''
+        return sorted(self.__columns)
+
+    def filter(self, mask):
+        '''
+        Select some of the rows of the table
+
+        :param mask:
+            A boolean array with one entry per row, typically built by
+            comparing columns, e.g. ``table['status'] == 'MERGED'``. An
+            array of row indices is also accepted.
+
+        :returns: A new `ReviewTable` holding the selected rows
+
+        '''
+        indices = np.arange(len(self))[mask]
+        return ReviewTable._from_columns(dict(
+            (name, column.take(indices)
+             if isinstance(column, EncodedColumn) else column[indices])
+            for name, column in self.__columns.items()))
+
+    def group_by(self, name):
+        '''
+        Split the table by the values of one column
+
+        :param name: The name of the column to group by
+
+        :returns:
+            A dictionary mapping each distinct value of the column to a
+            `ReviewTable` holding the rows with that value. Each row
+            appears in exactly one group.
+
+        '''
+        column = self.__columns[name]
+        keys = column.codes if isinstance(column, EncodedColumn) else column
+        order = np.argsort(keys, kind='mergesort')
+        distinct, starts = np.unique(keys[order], return_index=True)
+        groups = np.split(order, starts[1:])
+
+        if isinstance(column, EncodedColumn):
+            distinct = [column.labels[c] for c in distinct]
+        else:
+            distinct = distinct.tolist()
+
+        return dict((key, self.filter(rows))
+                    for key, rows in zip(distinct, groups))
+
+    def counts(self, name):
+        '''
+        Count the rows with each distinct value of one column
+
+        :returns: A dictionary mapping each value to its number of rows
+        '''
+        return dict((key, len(table))
+                    for key, table in self.group_by(name).items())
+
+    def ages(self):
+        '''
+        How old each review is, computed as for `Review.age`
+
+        :returns:
+            A timedelta64[s] array of the time from creation to the last
+            update, or zero if the review was updated before it was
+            created. NaT where either time is missing.
+
+        '''
+        age = self.__columns['updated'] - self.__columns['created']
+        return np.maximum(age, np.timedelta64(0, 's'))
+
+__all__ = ['ReviewTable', 'EncodedColumn']
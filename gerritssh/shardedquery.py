@@ -0,0 +1,374 @@
+r'''
+Run one logical query as several concurrent sub-queries.
+
+A single `Query` pages through its results one request at a time, over
+one connection. A `ShardedQuery` splits the same query into independent
+shards, each adding its own search terms, runs the shards concurrently
+and merges their results back into a single stream.
+
+Shards are most easily produced with `project_shards`, from a list of
+projects, or `time_window_shards`, which splits a period of time into
+windows on the last-updated time of the reviews::
+
+    import datetime
+    import gerritssh
+
+    site = gerritssh.Site('gerrit.example.com', pool_size=4).connect()
+    projects = gerritssh.ProjectList()
+    projects.execute_on(site)
+
+    q = gerritssh.ShardedQuery(query='status:merged',
+                               shards=gerritssh.project_shards(projects))
+    for r in q.iter_execute(site):
+        print(r.number, r.summary)
+
+The shards share the connections of the site. At most ``max_workers``
+shards run at once, and the rest wait for a running shard to finish. By
+default the limit is the site's ``max_channels``, if it has one, or
+otherwise its ``pool_size``. A site with neither set above one therefore
+runs its shards one at a time, so pass ``max_workers`` to run more at
+once over a single connection.
+
+'''
+
+import heapq
+import logging
+import threading
+
+try:  # pragma: no cover
+    import queue  # Python 3
+except ImportError:  # pragma: no cover
+    import Queue as queue  # Python 2
+
+from .gerritsite import SiteCommand
+from .governor import command_priority, current_priority
+from .query import Query
+
+_logger = logging.getLogger(__name__)
+
+
+class ShardedQuery(SiteCommand):
+    '''
+    Execute a query as several concurrent sub-queries, merging the results
+
+    :param option_str:
+        One or more supported options to be passed to each sub-query. See
+        `Query` for details.
+
+    :param query:
+        The search terms common to every shard, e.g. 'status:merged'
+
+    :param shards:
+        A sequence of strings, each holding the additional search terms
+        for one shard, e.g. ['project:a', 'project:b']. The shards should
+        together cover the results wanted. They may overlap, in which case
+        `dedupe` should be left on.
+
+    :param max_results:
+        Limit the merged result set to the first 'n'. If not given, all
+        results are returned.
+
+    :param ordered:
+        If True (the default) the merged results are returned with the most
+        recently updated first, the order in which Gerrit returns the
+        results of a single query. Each shard returns its results in that
+        order, so they are merged with a heap. If False, results are
+        returned in the order they arrive, from whichever shard is ready.
+
+    :param dedupe:
+        If True (the default), a review returned by more than one shard is
+        only returned once, as identified by its change number.
+
+    :param prefetch:
+        The number of pages each shard may fetch ahead of the merge. This
+        must be at least one, so that a shard waiting for the merge does
+        not hold one of the site's connections.
+
+    :param max_workers:
+        The largest number of shards to run at once. The remaining shards
+        are queued, and each is started when a running shard finishes. If
+        not given, the site's max_channels is used if it is set, and its
+        pool_size otherwise.
+
+        When the results are ordered, the merge needs the first result
+        from every shard. So if there are more shards than workers, each
+        shard's results are held in memory until the merge reaches them.
+
+    :param fields:
+        The JSON fields needed from each review, as for `Query`. The
+        lastUpdated and number fields, used by the merge, are always
+        returned by Gerrit.
+
+    :param keep_raw:
+        If False, each `Review` keeps only its commonly used fields, as
+        for `Query`.
+
+    :param intern:
+        If True, the repeated strings in the results are interned, as for
+        `Query`. As the shards share the interned strings, a value repeated
+        in several shards is only held once.
+
+    :raises: `ValueError`
+        if no shards are given, or prefetch or max_workers is below one
+    :raises: `SystemExit` if the option_str fails to parse
+
+    '''
+
+    __supported_versions = '>=2.4'
+
+    def __init__(self, option_str='', query='', shards=(), max_results=0,
+                 ordered=True, dedupe=True, prefetch=1, max_workers=None,
+                 fields=None, keep_raw=True, intern=False):
+        shards = list(shards)
+        if not shards:
+            raise ValueError('At least one shard is required')
+
+        if prefetch < 1:
+            raise ValueError('prefetch must be at least one')
+
+        if max_workers is not None and max_workers < 1:
+            raise ValueError('max_workers must be at least one')
+
+        self.__shards = shards
+        self.__max_results = max_results
+        self.__ordered = ordered
+        self.__dedupe = dedupe
+        self.__max_workers = max_workers
+        # Create the sub-queries now, so any option errors are reported
+        # by the constructor, just as they are for a Query.
+        self.__queries = [Query(option_str,
+                                ' '.join([query, shard]).strip(),
+                                max_results,
+                                prefetch,
+                                fields=fields,
+                                keep_raw=keep_raw,
+                                intern=intern)
+                          for shard in shards]
+        super(ShardedQuery, self).__init__(ShardedQuery.__supported_versions,
+                                           None, None)
+
+    @property
+    def shards(self):
+        ''' The additional search terms for each shard '''
+        return list(self.__shards)
+
+    def execute_on(self, the_site):
+        '''
+        Execute all the shards, and return the merged results
+
+        :param the_site: A `Site` object on which to execute the command
+
+        :returns: A list of `Review` objects
+
+        '''
+        self._results = list(self.iter_execute(the_site))
+        return self._results
+
+    def iter_execute(self, the_site):
+        '''
+        Execute all the shards, yielding the merged results as they arrive
+
+        Up to `max_workers` shards are started as soon as iteration begins,
+        each in its own thread. Closing the iterator early stops them all.
+
+        :param the_site: A `Site` object on which to execute the command
+
+        :returns: An iterator over `Review` objects
+
+        :raises: `NotImplementedError`
+            If the site does not support the command or one of its options.
+            This is raised immediately, not when iteration begins.
+
+        '''
+        self.check_support_for(the_site)
+        streams = [q.iter_execute(the_site) for q in self.__queries]
+        workers = (self.__max_workers or the_site.max_channels or
+                   the_site.pool_size)
+        return self.__merge(streams, min(workers, len(streams)))
+
+    def __merge(self, streams, workers):
+        '''
+        Generator which runs the streams in a fixed number of threads and
+        merges the output
+        '''
+        stop = threading.Event()
+        # Each shard feeds its own queue when the results are ordered, as
+        # the heap must see the next result from every shard. Otherwise
+        # they all feed one queue, in order of arrival. A shard waiting
+        # for a worker has not produced its first result, so when some
+        # shards must wait, the running shards cannot be held back by the
+        # merge without deadlocking it.
+        if not self.__ordered:
+            queues = [queue.Queue(_BUFFERED_RESULTS)] * len(streams)
+        elif workers < len(streams):
+            queues = [queue.Queue() for _ in streams]
+        else:
+            queues = [queue.Queue(_BUFFERED_RESULTS) for _ in streams]
+
+        tasks = queue.Queue()
+        for task in zip(streams, queues):
+            tasks.put(task)
+
+        priority = current_priority()
+        for _ in range(workers):
+            t = threading.Thread(target=_run_shards,
+                                 args=(tasks, stop, priority))
+            t.daemon = True
+            t.start()
+
+        if self.__ordered:
+            merged = heapq.merge(*[_ordered_results(q, index)
+                                   for index, q in enumerate(queues)])
+            results = (r for _, _, _, r in merged)
+        else:
+            results = _arrived_results(queues[0], len(streams))
+
+        seen = set()
+        count = 0
+        try:
+            for r in results:
+                if self.__dedupe:
+                    if r.number in seen:
+                        continue
+                    seen.add(r.number)
+
+                yield r
+                count += 1
+                if count == self.__max_results:
+                    return
+        finally:
+            stop.set()
+
+
+# The number of reviews each shard may queue ahead of the merge
+_BUFFERED_RESULTS = 100
+
+# Marks the end of a shard's results in its queue
+_END_OF_SHARD = None
+
+
+def _put(q, item, stop):
+    ''' Queue an item, unless the consumer has gone away '''
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _run_shard(stream, q, stop):
+    ''' Thread body copying one shard's results into a queue '''
+    try:
+        for r in stream:
+            if not _put(q, r, stop):
+                break
+    except Exception as e:
+        _logger.debug('Shard failed: {0}'.format(e))
+        _put(q, e, stop)
+    finally:
+        stream.close()
+
+    _put(q, _END_OF_SHARD, stop)
+
+
+def _run_shards(tasks, stop, priority):
+    '''
+    Worker thread body running queued shards until none remain, with the
+    priority of the thread which started the query
+    '''
+    with command_priority(priority):
+        while True:
+            try:
+                stream, q = tasks.get_nowait()
+            except queue.Empty:
+                return
+
+            if stop.is_set():
+                stream.close()
+            else:
+                _run_shard(stream, q, stop)
+
+
+def _get(q):
+    ''' Take the next item from a queue, raising any shard failure '''
+    item = q.get()
+    if isinstance(item, Exception):
+        raise item
+    return item
+
+
+def _ordered_results(q, index):
+    '''
+    Generator of sort keys and reviews from one shard, for use by
+    heapq.merge. The shard index and sequence number ensure two reviews
+    are never compared directly.
+
+    '''
+    seq = 0
+    while True:
+        r = _get(q)
+        if r is _END_OF_SHARD:
+            return
+        yield (-r.raw['lastUpdated'], index, seq, r)
+        seq += 1
+
+
+def _arrived_results(q, shard_count):
+    ''' Generator of reviews from a queue shared by all shards '''
+    remaining = shard_count
+    while remaining:
+        r = _get(q)
+        if r is _END_OF_SHARD:
+            remaining -= 1
+        else:
+            yield r
+
+
+def project_shards(projects):
+    '''
+    Create one shard per project
+
+    :param projects:
+        An iterable of project names, such as the results of executing a
+        `ProjectList` command, or the command object itself.
+
+    :returns: A list of 'project:' search terms
+
+    '''
+    return ['project:{0}'.format(p) for p in projects]
+
+
+def time_window_shards(start, end, windows):
+    '''
+    Split a period of time into windows of equal length
+
+    Each shard restricts the query to reviews last updated within its
+    window. The 'after:' and 'before:' operators require Gerrit 2.9 or
+    later.
+
+    :param datetime start: The beginning of the period
+    :param datetime end: The end of the period
+    :param int windows: The number of shards to create
+
+    :returns: A list of 'after: before:' search terms
+
+    :raises: `ValueError` if windows is less than one or end is not after
+             start
+
+    '''
+    if windows < 1:
+        raise ValueError('At least one window is required')
+
+    if end <= start:
+        raise ValueError('end must be later than start')
+
+    step = (end - start) // windows
+    bounds = [start + step * i for i in range(windows)] + [end]
+    fmt = '%Y-%m-%d %H:%M:%S'
+    return ['\'after:"{0}" before:"{1}"\''.format(lo.strftime(fmt),
+                                                 hi.strftime(fmt))
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+__all__ = ['ShardedQuery', 'project_shards', 'time_window_shards']
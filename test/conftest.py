@@ -63,6 +63,9 @@ def dummy_site():
             def execute(self, cmd):
                 return exec_func(cmd)
 
+            def execute_stream(self, cmd):
+                return iter(exec_func(cmd))
+
             @property
             def version(self):
                 return SV.Version(version)
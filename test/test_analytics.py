@@ -0,0 +1,90 @@
+'''
+Tests for the gerritssh.analytics module.
+
+'''
+import datetime
+
+import pytest
+
+import gerritssh as gssh
+
+np = pytest.importorskip('numpy')
+
+DAY = 24 * 60 * 60
+
+
+def make_review(template, number, status, created, updated, approvals):
+    '''
+    A review owned by 'owner', with one patch set per list of approvals.
+    Each approval is a (username, grantedOn) pair.
+
+    '''
+    patchsets = [{'number': str(n + 1),
+                  'approvals': [{'type': 'Code-Review', 'value': '1',
+                                 'by': {'username': user},
+                                 'grantedOn': granted}
+                                for user, granted in ps]}
+                 for n, ps in enumerate(approvals)]
+    raw = dict(template, number=str(number), status=status,
+               owner={'username': 'owner'}, createdOn=created,
+               lastUpdated=updated, patchSets=patchsets)
+    del raw['currentPatchSet']
+    return gssh.Review(raw)
+
+
+@pytest.fixture
+def reviews(open_review_json):
+    t = open_review_json[0]
+    return [
+        make_review(t, 1, 'MERGED', 0, 2 * DAY,
+                    [[('a', DAY)], [('owner', 10), ('b', 2 * DAY)]]),
+        make_review(t, 2, 'MERGED', DAY, 9 * DAY, [[('a', 3 * DAY)]]),
+        make_review(t, 3, 'NEW', DAY, 5 * DAY, [[('owner', 2 * DAY)]]),
+        make_review(t, 4, 'MERGED', 8 * DAY, 12 * DAY,
+                    [[('b', 9 * DAY), ('a', 8 * DAY + 60)]]),
+        ]
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        gssh.ReviewAnalytics(bucket=datetime.timedelta(0))
+
+    with pytest.raises(ValueError):
+        gssh.ReviewAnalytics(batch_size=0)
+
+    a = gssh.ReviewAnalytics()
+    assert a.count == 0
+    assert a.throughput() == {}
+    assert a.cycle_time_percentiles() == {}
+    assert a.approvals_by_reviewer() == {}
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 100])
+def test_statistics(reviews, batch_size):
+    a = gssh.ReviewAnalytics(batch_size=batch_size)
+    assert a.update(iter(reviews)) is a
+    assert a.count == 4
+
+    # The epoch was a Thursday, so weeks run from Thursday
+    epoch = datetime.datetime(1970, 1, 1)
+    assert a.throughput() == {epoch: 1,
+                              epoch + datetime.timedelta(days=7): 2}
+
+    p = a.cycle_time_percentiles([0, 50, 100])
+    assert p[0] == datetime.timedelta(days=2)
+    assert p[50] == datetime.timedelta(days=4)
+    assert p[100] == datetime.timedelta(days=8)
+
+    p = a.first_review_percentiles([0, 100])
+    assert p[0] == datetime.timedelta(seconds=60)
+    assert p[100] == datetime.timedelta(days=2)
+
+    assert a.approvals_by_reviewer() == {'a': 3, 'b': 2, 'owner': 2}
+
+
+def test_daily(reviews):
+    a = gssh.ReviewAnalytics(bucket=datetime.timedelta(days=1))
+    a.add(reviews[0]).add(reviews[1])
+    epoch = datetime.datetime(1970, 1, 1)
+    assert a.throughput() == {epoch + datetime.timedelta(days=2): 1,
+                              epoch + datetime.timedelta(days=9): 1}
@@ -0,0 +1,79 @@
+'''
+Tests for the asyncio front end in gerritssh.asyncsite
+
+'''
+import sys
+import threading
+
+import pytest
+
+import gerritssh
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5),
+                                reason='asyncio API requires Python 3.5')
+
+
+def run(coro):
+    import asyncio
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_init(connected_site):
+    with pytest.raises(TypeError):
+        gerritssh.AsyncSite(1)
+
+    with pytest.raises(ValueError):
+        gerritssh.AsyncSite(connected_site, pool_size=2)
+
+    a = gerritssh.AsyncSite('gerrit.example.com', pool_size=3)
+    assert a.max_workers == 3
+    assert a.blocking_site.pool_size == 3
+    assert a.site == 'gerrit.example.com'
+    assert not a.connected
+    a.close()
+
+    a = gerritssh.AsyncSite(connected_site, max_workers=2)
+    assert a.max_workers == 2
+    assert a.blocking_site is connected_site
+    assert a.connected
+    assert a.version_in('>=2.9')
+    assert str(a.version) == '2.9.0'
+    a.close()
+
+
+def test_execute(connected_site):
+    a = gerritssh.AsyncSite(connected_site)
+    main_thread = threading.current_thread()
+    threads = []
+
+    def execute(cmd):
+        threads.append(threading.current_thread())
+        return ['result of ' + cmd]
+
+    connected_site.execute = execute
+    connected_site.execute_stream = lambda cmd: iter(execute(cmd))
+
+    assert run(a.execute('version')) == ['result of version']
+    assert run(gerritssh.ProjectList().execute_on_async(a)) == \
+        ['result of ls-projects']
+    assert threads and main_thread not in threads
+
+    assert run(a.disconnect()) is a
+    assert not a.connected
+    a.close()
+
+
+def test_context_manager(connected_site):
+    connected_site.disconnect()
+    a = gerritssh.AsyncSite(connected_site)
+
+    # Equivalent to 'async with a as s:'
+    s = run(a.__aenter__())
+    assert s is a
+    assert a.connected
+    run(a.__aexit__(None, None, None))
+    assert not a.connected
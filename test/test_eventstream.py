@@ -0,0 +1,284 @@
+'''
+Tests for the gerritssh.eventstream module.
+
+'''
+import json
+import threading
+import time
+
+import pytest
+
+import gerritssh as gssh
+
+
+def _events(open_review_json):
+    change = open_review_json[0]
+    return [
+        {'type': 'patchset-created', 'eventCreatedOn': 1000,
+         'change': change, 'patchSet': change['patchSets'][0],
+         'uploader': {'name': 'Jane Doe', 'username': 'jdoe'}},
+        {'type': 'comment-added', 'eventCreatedOn': 1010, 'change': change,
+         'author': {'username': 'rev'}, 'comment': 'LGTM',
+         'approvals': [{'type': 'Code-Review', 'value': '2'}]},
+        {'type': 'change-merged', 'eventCreatedOn': 1020, 'change': change,
+         'submitter': {'username': 'jdoe'}},
+        {'type': 'ref-updated', 'eventCreatedOn': 1030,
+         'submitter': {'name': 'Bot'},
+         'refUpdate': {'project': 'p', 'refName': 'master',
+                       'oldRev': 'a' * 40, 'newRev': 'b' * 40}},
+        {'type': 'reviewer-added', 'eventCreatedOn': 1040, 'change': change},
+        ]
+
+
+@pytest.fixture
+def event_site(dummy_site, open_review_json):
+    '''
+    A site whose event stream is a list of "connections", each a list of
+    events followed optionally by an exception. Once they are used up,
+    the stream blocks until released.
+
+    '''
+    def execute(cmd):
+        assert cmd == 'stream-events'
+        site.streams += 1
+        if not site.connections:
+            site.release.wait()
+            return
+
+        events = site.connections.pop(0)
+        for e in events:
+            if isinstance(e, Exception):
+                raise e
+            yield json.dumps(e)
+
+    site = dummy_site(execute, '2.9.0')
+    site.streams = 0
+    site.connections = []
+    site.release = threading.Event()
+    site.events = _events(open_review_json)
+    return site
+
+
+def _take(stream, n):
+    result = []
+    for e in stream:
+        result.append(e)
+        if len(result) == n:
+            break
+    return result
+
+
+def test_typed_events(event_site, open_review):
+    event_site.connections = [event_site.events]
+    with gssh.EventStream(event_site) as stream:
+        events = _take(stream, 5)
+
+    event_site.release.set()
+    assert [type(e) for e in events] == [
+        gssh.PatchsetCreated, gssh.CommentAdded, gssh.ChangeMerged,
+        gssh.RefUpdated, gssh.Event]
+
+    created, comment, merged, ref, other = events
+    assert created.type == 'patchset-created'
+    assert created.uploader == 'Jane Doe'
+    assert created.change.number == open_review.number
+    assert created.patchset.number == 1
+    assert created.created_on.year == 1970
+    assert comment.comment == 'LGTM'
+    assert comment.approvals == {'Code-Review': 2}
+    assert comment.author == 'rev'
+    assert merged.submitter == 'jdoe'
+    assert ref.change is None and ref.patchset is None
+    assert (ref.project, ref.ref_name) == ('p', 'master')
+    assert ref.new_rev == 'b' * 40
+    assert other.type == 'reviewer-added'
+    assert other.eventCreatedOn == 1040
+    with pytest.raises(AttributeError):
+        other.missing
+
+
+def test_event_types(event_site):
+    event_site.connections = [event_site.events]
+    with gssh.EventStream(event_site,
+                          event_types=['change-merged']) as stream:
+        events = _take(stream, 1)
+
+    event_site.release.set()
+    assert [e.type for e in events] == ['change-merged']
+    assert stream.received == 5
+
+
+def test_reconnect_and_gap(event_site):
+    events = event_site.events
+    event_site.connections = [events[:2] + [IOError('dropped')],
+                              [IOError('refused')],
+                              events[2:3]]
+    stream = gssh.EventStream(event_site, reconnect_delay=0.01).start()
+    received = _take(stream, 4)
+    stream.stop()
+    event_site.release.set()
+
+    assert [e.type for e in received] == [
+        'patchset-created', 'comment-added', 'gerritssh-gap',
+        'change-merged']
+    gap = received[2]
+    assert isinstance(gap, gssh.EventGap)
+    assert gap.since_seconds == 1010
+    assert gap.until_seconds >= time.time() - 60
+    assert gap.seconds > 0
+    assert stream.reconnects >= 2
+
+
+def test_max_retries(event_site):
+    event_site.connections = [[IOError('refused')]] * 3
+    stream = gssh.EventStream(event_site, reconnect_delay=0.01,
+                              max_retries=1).start()
+    with pytest.raises(IOError):
+        list(stream)
+    assert event_site.streams == 2
+    assert stream.interrupted
+
+
+@pytest.mark.parametrize('policy,expected', [
+    ('drop_newest', ['patchset-created', 'comment-added']),
+    ('drop_oldest', ['ref-updated', 'reviewer-added']),
+    ])
+def test_drop_policies(event_site, policy, expected):
+    event_site.connections = [event_site.events]
+    stream = gssh.EventStream(event_site, maxsize=2,
+                              backpressure=policy).start()
+    deadline = time.time() + 5
+    while stream.received < 5 and time.time() < deadline:
+        time.sleep(0.01)
+
+    stream.stop()
+    event_site.release.set()
+    assert [e.type for e in stream] == expected
+    assert stream.dropped == 3
+
+
+def test_block_policy(event_site):
+    event_site.connections = [event_site.events]
+    stream = gssh.EventStream(event_site, maxsize=1).start()
+    time.sleep(0.1)
+    assert stream.received == 2  # One queued, one waiting for room
+    assert len(_take(stream, 5)) == 5
+    assert stream.dropped == 0
+    stream.stop()
+    event_site.release.set()
+
+
+def test_arguments(event_site):
+    with pytest.raises(ValueError):
+        gssh.EventStream(event_site, maxsize=0)
+    with pytest.raises(ValueError):
+        gssh.EventStream(event_site, backpressure='spill')
+
+
+def test_reconnect_dropped_transport():
+    '''
+    A stream over a real GerritSSHClient whose transport drops connects
+    the site again, rather than failing on the dead transport forever
+    '''
+    import io
+    from paramiko.ssh_exception import SSHException
+    from gerritssh.borrowed.ssh import GerritSSHClient
+
+    class Transport(object):
+        def __init__(self):
+            self.active = True
+
+        def is_active(self):
+            return self.active
+
+        def close(self):
+            self.active = False
+
+    release = threading.Event()
+
+    def events(client, n):
+        yield json.dumps({'type': 'ref-updated', 'eventCreatedOn': n,
+                          'refUpdate': {}}) + '\n'
+        if client.connects == 1:
+            client.get_transport().active = False
+        else:
+            release.wait()
+
+    class Client(GerritSSHClient):
+        connects = 0
+
+        def _do_connect(self):
+            self.connects += 1
+            self._transport = Transport()
+
+        def exec_command(self, command, **kwargs):
+            if not self.get_transport().is_active():
+                raise SSHException('SSH session not active')
+
+            if command.split()[1] == 'version':
+                stdout = io.StringIO(u'gerrit version 2.9.0\n')
+            else:
+                stdout = events(self, self.connects)
+            return io.StringIO(), stdout, io.StringIO()
+
+    client = Client('gerrit.example.com')
+    site = gssh.Site('gerrit.example.com')
+    site._Site__ssh = client
+    site.connect()
+    assert site.connected
+
+    stream = gssh.EventStream(site, reconnect_delay=0.01,
+                              max_retries=3).start()
+    received = _take(stream, 3)
+    stream.stop()
+    release.set()
+
+    assert [e.type for e in received] == ['ref-updated', 'gerritssh-gap',
+                                          'ref-updated']
+    assert client.connects == 2
+    assert site.connected
+
+
+def test_stop_closes_channel(connected_site):
+    '''
+    Stopping closes the channel of the stream, so the background thread
+    exits, and releases its connection, without waiting for an event
+    '''
+    from gerritssh.borrowed.ssh import SSHCommandResult
+
+    class Channel(object):
+        def __init__(self):
+            self.closed = threading.Event()
+
+        def close(self):
+            self.closed.set()
+
+    class Output(object):
+        ''' Output which blocks until its channel is closed '''
+
+        def __init__(self):
+            self.channel = Channel()
+
+        def __iter__(self):
+            self.channel.closed.wait(10)
+            return iter([])
+
+    released = []
+    opened = threading.Event()
+
+    def execute(command):
+        result = SSHCommandResult(command, None, Output(), None)
+        result.add_close_callback(lambda: released.append(command))
+        opened.set()
+        return result
+
+    connected_site._Site__ssh.execute = execute
+    stream = gssh.EventStream(connected_site).start()
+    assert opened.wait(5)
+    stream.stop()
+
+    deadline = time.time() + 5
+    while stream._EventStream__thread.is_alive() and time.time() < deadline:
+        time.sleep(0.01)
+    assert not stream._EventStream__thread.is_alive()
+    assert len(released) == 1
@@ -0,0 +1,222 @@
+'''
+Tests for the gerritssh.governor module.
+
+'''
+import threading
+import time
+
+import pytest
+
+import gerritssh as gssh
+
+
+def _wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.005)
+
+
+def test_max_in_flight():
+    governor = gssh.Governor(max_in_flight=1)
+    order = []
+
+    def command(n):
+        governor.acquire('query n:{0}'.format(n))
+        order.append(n)
+        governor.release('query')
+
+    governor.acquire('ls-projects')
+    assert governor.in_flight == 1
+
+    # Waiting commands are admitted in the order they arrived
+    threads = []
+    for n in range(5):
+        t = threading.Thread(target=command, args=(n,))
+        t.start()
+        threads.append(t)
+        _wait_for(lambda: governor.waiting == n + 1)
+
+    assert not order
+    governor.release('ls-projects')
+    for t in threads:
+        t.join()
+
+    assert order == list(range(5))
+    assert governor.in_flight == 0
+
+    # stream-events never finishes, so does not hold a slot
+    governor.acquire('stream-events')
+    governor.acquire('version')
+    assert governor.in_flight == 1
+    governor.release('version')
+    governor.release('stream-events')
+    assert governor.in_flight == 0
+
+
+def test_rates():
+    governor = gssh.Governor(rates={'query': 20}, burst=2)
+    start = time.time()
+    for _ in range(2):
+        governor.acquire('query')
+    assert time.time() - start < 0.04
+    assert governor.throttled == 0
+
+    # Commands of other types are not held up by an empty bucket
+    governor.acquire('ls-groups')
+    assert governor.throttled == 0
+
+    for _ in range(3):
+        governor.acquire('query')
+    assert time.time() - start >= 0.14
+    assert governor.throttled == 3
+
+
+def test_site_default_max_in_flight():
+    ''' A site limits the commands in flight to its connections '''
+    for args, expected in [({}, None),
+                           ({'pool_size': 3}, 3),
+                           ({'max_channels': 2}, 2)]:
+        governor = gssh.Governor()
+        gssh.Site('gerrit.example.com', governor=governor, **args)
+        assert governor.max_in_flight == expected
+
+    governor = gssh.Governor(max_in_flight=5)
+    gssh.Site('gerrit.example.com', pool_size=3, governor=governor)
+    assert governor.max_in_flight == 5
+
+    # Commands already in flight are counted once it is limited
+    governor = gssh.Governor()
+    governor.acquire('query')
+    assert governor.in_flight == 1
+    governor.default_max_in_flight(1)
+    governor.release('query')
+    assert governor.in_flight == 0
+
+
+def test_default_rate():
+    governor = gssh.Governor(default_rate=1000, rates={'query': 10})
+    for _ in range(3):
+        governor.acquire('ls-members x')
+    assert governor.throttled == 2
+
+
+def test_site(connected_site):
+    governor = gssh.Governor(max_in_flight=1, default_rate=1000, burst=10)
+    site = gssh.Site('gerrit.example.com', governor=governor)
+    site._Site__ssh = connected_site._Site__ssh
+    assert site.copy().governor is governor
+
+    stream = site.execute_stream('ls-projects')
+    next(stream)
+    assert governor.in_flight == 1
+    stream.close()
+    assert governor.in_flight == 0
+
+    site.execute('ban-commit p 1234')
+    assert governor.in_flight == 0
+
+
+def test_arguments():
+    with pytest.raises(ValueError):
+        gssh.Governor(max_in_flight=0)
+    with pytest.raises(ValueError):
+        gssh.Governor(burst=0)
+    with pytest.raises(ValueError):
+        gssh.Governor(rates={'query': 0})
+    with pytest.raises(ValueError):
+        gssh.Governor(default_rate=-1)
+
+
+def test_command_priority():
+    assert gssh.current_priority() == gssh.Priority.NORMAL
+    with gssh.command_priority(gssh.Priority.BULK):
+        assert gssh.current_priority() == gssh.Priority.BULK
+        with gssh.command_priority(gssh.Priority.INTERACTIVE):
+            assert gssh.current_priority() == gssh.Priority.INTERACTIVE
+        assert gssh.current_priority() == gssh.Priority.BULK
+    assert gssh.current_priority() == gssh.Priority.NORMAL
+
+
+def _queue_in_order(governor, priorities, delay=0):
+    '''
+    Queue a command for each priority in turn, while the only slot is
+    held, then release it and return the order in which they were served
+    '''
+    order = []
+
+    def command(priority):
+        with gssh.command_priority(priority):
+            governor.acquire('query')
+        order.append(priority)
+        governor.release('query')
+
+    governor.acquire('ls-projects')
+    threads = []
+    for n, priority in enumerate(priorities):
+        t = threading.Thread(target=command, args=(priority,))
+        t.start()
+        threads.append(t)
+        _wait_for(lambda: governor.waiting == n + 1)
+        time.sleep(delay)
+
+    depths = governor.queue_depths
+    governor.release('ls-projects')
+    for t in threads:
+        t.join()
+    return order, depths
+
+
+def test_priorities():
+    P = gssh.Priority
+    governor = gssh.Governor(max_in_flight=1, aging=100)
+    order, depths = _queue_in_order(governor, [P.BULK, P.NORMAL, P.BULK,
+                                               P.INTERACTIVE])
+    assert order == [P.INTERACTIVE, P.NORMAL, P.BULK, P.BULK]
+    assert depths == {P.BULK: 2, P.NORMAL: 1, P.INTERACTIVE: 1}
+    assert governor.peak_queue_depth == 4
+    assert set(governor.wait_seconds) == set([P.BULK, P.NORMAL,
+                                              P.INTERACTIVE])
+    assert governor.queue_depths == {}
+
+    # Without aging, commands are served in order of arrival
+    governor = gssh.Governor(max_in_flight=1, aging=0)
+    order, _ = _queue_in_order(governor, [P.BULK, P.INTERACTIVE])
+    assert order == [P.BULK, P.INTERACTIVE]
+
+
+def test_aging():
+    P = gssh.Priority
+    governor = gssh.Governor(max_in_flight=1, aging=0.2)
+    order, _ = _queue_in_order(governor, [P.BULK, P.INTERACTIVE,
+                                          P.INTERACTIVE], delay=0.3)
+    assert order == [P.INTERACTIVE, P.BULK, P.INTERACTIVE]
+
+
+def test_priority_of_threads(dummy_site):
+    seen = []
+
+    def execute(cmd):
+        seen.append(gssh.current_priority())
+        return []
+
+    site = dummy_site(execute, '2.9.0')
+    with gssh.command_priority(gssh.Priority.BULK):
+        gssh.Query(query='status:open', prefetch=1).execute_on(site)
+        gssh.ShardedQuery(query='status:open', shards=['project:a',
+                                                       'project:b'],
+                          max_workers=2).execute_on(site)
+
+    assert seen == [gssh.Priority.BULK] * 3
+
+
+def test_site_priority(connected_site):
+    governor = gssh.Governor(max_in_flight=1)
+    site = gssh.Site('gerrit.example.com', governor=governor)
+    site._Site__ssh = connected_site._Site__ssh
+
+    # The priority is that of the thread executing the command, even if
+    # the output is read elsewhere
+    with gssh.command_priority(gssh.Priority.INTERACTIVE):
+        stream = site.execute_stream('ls-groups')
+    list(stream)
+    assert list(governor.wait_seconds) == [gssh.Priority.INTERACTIVE]
@@ -0,0 +1,48 @@
+'''
+Tests for the gerritssh.internal.jsonlines module.
+
+'''
+import pytest
+
+from gerritssh.internal import jsonlines
+
+
+def test_backend():
+    assert jsonlines.backend in ['orjson', 'ujson', 'json']
+    assert jsonlines.loads('{"a": [1, 2]}') == {'a': [1, 2]}
+
+
+def test_iter_json(open_review_text, open_review_json):
+    it = jsonlines.iter_json(['{"a": 1}\n\n  {"b": 2}  \n', '{"c": 3}'])
+    assert next(it) == {'a': 1}
+    assert list(it) == [{'b': 2}, {'c': 3}]
+
+    assert list(jsonlines.iter_json(open_review_text)) == open_review_json
+    assert list(jsonlines.iter_json(' \n')) == []
+
+    # Bad input is only found when it is reached
+    it = jsonlines.iter_json(['{"a": 1}', 2])
+    assert next(it) == {'a': 1}
+    with pytest.raises(TypeError):
+        next(it)
+
+    with pytest.raises(TypeError):
+        list(jsonlines.iter_json(None))
+
+    with pytest.raises(ValueError):
+        list(jsonlines.iter_json('{"a": '))
+
+
+def test_interned():
+    a = jsonlines.loads('{"project": "tools/x", "owner": {"name": "A B"},'
+                        ' "subject": "fix", "approvals": [{"type": "Code"}]}')
+    b = jsonlines.loads('{"project": "tools/x", "owner": {"name": "A B"},'
+                        ' "subject": "fix", "approvals": [{"type": "Code"}]}')
+    assert jsonlines.interned(a) is a
+    jsonlines.interned(b)
+    assert a == b
+    assert a['project'] is b['project']
+    assert a['owner']['name'] is b['owner']['name']
+    assert a['approvals'][0]['type'] is b['approvals'][0]['type']
+    assert list(a) == ['project', 'owner', 'subject', 'approvals']
+    assert jsonlines.interned([1, 'a', None]) == [1, 'a', None]
@@ -52,6 +52,9 @@ def test_execute(open_review_text, open_review):
             assert type(cmd) == type('abc')
             return next(self.gen)
 
+        def execute_stream(self, cmd):
+            return iter(self.execute(cmd).splitlines())
+
         @property
         def version(self):
             return SV.Version('2.9.0')
@@ -135,3 +138,343 @@ def test_statusreviews(monkeypatch, connected_site):
         assert 'status:' in r[1]
         assert 'project:fred' in r[1]
         assert 'branch:next' in r[1]
+
+
+def test_iter_execute(dummy_site, open_review_text):
+    '''
+    Check that iter_execute yields each page's reviews before the next
+    page is requested, and does not store the results.
+
+    '''
+    commands = []
+    pages = [open_review_text.splitlines()] * 3 + [[]]
+
+    def execute(cmd):
+        commands.append(cmd)
+        return pages[len(commands) - 1]
+
+    s = dummy_site(execute, '2.8.0')
+    q = gssh.Query('', 'status:open')
+    it = q.iter_execute(s)
+    assert not commands, 'Query sent before iteration began'
+
+    r = next(it)
+    assert isinstance(r, gssh.Review)
+    assert len(commands) == 1
+    assert 'resume_sortkey' not in commands[0]
+
+    rest = list(it)
+    assert len(rest) == 2
+    assert len(commands) == 4
+    assert 'resume_sortkey:' + r.raw['sortKey'] in commands[1]
+    assert q.results == []
+
+    # The result limit is honoured without fetching further pages
+    del commands[:]
+    r = list(gssh.Query('', 'status:open', 2).iter_execute(s))
+    assert len(r) == 2
+    assert len(commands) == 2
+    assert 'limit:2' in commands[0]
+    assert 'limit:1' in commands[1]
+
+    # Unsupported options are reported before iteration begins
+    s = dummy_site(execute, '2.4.0')
+    with pytest.raises(NotImplementedError):
+        gssh.Query('--all-reviewers').iter_execute(s)
+
+
+def test_prefetch(dummy_site, open_review_text):
+    '''
+    Check that pages are fetched ahead of the consumer, up to the
+    requested depth, and that failures reach the consumer.
+
+    '''
+    import threading
+    import time
+
+    with pytest.raises(ValueError):
+        gssh.Query('', 'status:open', prefetch=-1)
+
+    commands = []
+    fetched = threading.Condition()
+    page = open_review_text.splitlines()
+
+    def execute(cmd):
+        with fetched:
+            commands.append(cmd)
+            fetched.notify_all()
+        return page if len(commands) <= 5 else []
+
+    def wait_for(n):
+        deadline = time.time() + 2
+        with fetched:
+            while len(commands) < n and time.time() < deadline:
+                fetched.wait(0.05)
+        return len(commands)
+
+    s = dummy_site(execute, '2.9.0')
+    it = gssh.Query('', 'status:open', prefetch=2).iter_execute(s)
+    r = next(it)
+    assert isinstance(r, gssh.Review)
+
+    # One page has been consumed, two more are buffered, and a fourth is
+    # waiting for room in the buffer.
+    assert wait_for(4) == 4
+    time.sleep(0.1)
+    assert len(commands) == 4
+    assert len(list(it)) == 4
+    assert len(commands) == 6
+
+    # Sequential paging gives the same results
+    del commands[:]
+    assert len(gssh.Query('', 'status:open').execute_on(s)) == 5
+
+    # Errors raised while prefetching are raised to the consumer
+    def fail(cmd):
+        raise gssh.SSHConnectionError('Connection dropped')
+
+    s = dummy_site(fail, '2.9.0')
+    with pytest.raises(gssh.SSHConnectionError):
+        gssh.Query('', 'status:open', prefetch=1).execute_on(s)
+
+
+@pytest.fixture
+def offset_site(dummy_site, open_review_json):
+    '''
+    A 2.9 site holding 'total' changes, numbered from zero, which honours
+    --start and limit: but never returns more than 'server_limit' rows in
+    a page. Every command is recorded in 'commands'.
+
+    '''
+    import json
+    import re
+
+    template = open_review_json[0]
+    state = {'total': 10, 'server_limit': 500, 'commands': []}
+
+    def execute(cmd):
+        state['commands'].append(cmd)
+        start = re.search(r'--start (\d+)', cmd)
+        start = int(start.group(1)) if start else 0
+        limit = re.search(r'limit:(\d+)', cmd)
+        size = min(int(limit.group(1)) if limit else 500,
+                   state['server_limit'])
+        numbers = list(range(state['total']))[start:start + size]
+        rows = [json.dumps(dict(template, number=str(n)))
+                for n in numbers]
+        more = start + len(numbers) < state['total']
+        return rows + [json.dumps({'type': 'stats',
+                                   'rowCount': len(rows),
+                                   'runTimeMilliseconds': 7,
+                                   'moreChanges': more})]
+
+    s = dummy_site(execute, '2.9.0')
+    s.state = state
+    return s
+
+
+def test_offset_paging(offset_site):
+    '''
+    Check that 2.9 sites are paged with --start, and that paging ends
+    on the stats line rather than on a short page.
+
+    '''
+    commands = offset_site.state['commands']
+    offset_site.state['server_limit'] = 4
+
+    r = list(gssh.Query('', 'status:open').iter_execute(offset_site))
+    assert [rv.number for rv in r] == list(range(10))
+    assert len(commands) == 3
+    assert '--start' not in commands[0]
+    assert '--start 4' in commands[1]
+    assert '--start 8' in commands[2]
+    assert not any('resume_sortkey' in c for c in commands)
+
+    # A short page which is not the last does not end the query
+    del commands[:]
+    q = gssh.Query('', 'status:open', page_size=6)
+    assert [rv.number for rv in q.iter_execute(offset_site)] == \
+        list(range(10))
+    assert 'limit:6' in commands[0]
+
+    # An empty page ends the query when there is no stats line
+    del commands[:]
+    offset_site.state['total'] = 0
+    assert list(gssh.Query('', 'status:open').iter_execute(offset_site)) == []
+    assert len(commands) == 1
+
+
+def test_parallel_pages(offset_site):
+    '''
+    Check that a fixed page size allows several pages to be requested at
+    once, that they are returned in order, and that the pages are planned
+    again if the server's page size is smaller.
+
+    '''
+    commands = offset_site.state['commands']
+    offset_site.state['total'] = 25
+
+    q = gssh.Query('', 'status:open', prefetch=3, page_size=5)
+    assert [rv.number for rv in q.iter_execute(offset_site)] == \
+        list(range(25))
+    assert all('limit:5' in c for c in commands)
+    starts = sorted(int(c.split('--start ')[1])
+                    for c in commands if '--start' in c)
+    assert starts[:4] == [5, 10, 15, 20]
+
+    del commands[:]
+    q = gssh.Query('', 'status:open', max_results=12, prefetch=3,
+                   page_size=5)
+    assert [rv.number for rv in q.iter_execute(offset_site)] == \
+        list(range(12))
+    assert 'limit:2' in commands[-1]
+
+    del commands[:]
+    offset_site.state['server_limit'] = 3
+    q = gssh.Query('', 'status:open', prefetch=2, page_size=5)
+    assert [rv.number for rv in q.iter_execute(offset_site)] == \
+        list(range(25))
+
+
+def test_start(dummy_site, offset_site):
+    '''
+    Check that --start offsets every page, and is validated
+    '''
+    commands = offset_site.state['commands']
+    offset_site.state['server_limit'] = 4
+
+    q = gssh.Query('--start 3', 'status:open')
+    assert [rv.number for rv in q.iter_execute(offset_site)] == \
+        list(range(3, 10))
+    assert '--start 3' in commands[0]
+    assert '--start 7' in commands[1]
+
+    del commands[:]
+    q = gssh.Query('--start 2', 'status:open', 3)
+    assert [rv.number for rv in q.execute_on(offset_site)] == [2, 3, 4]
+    assert len(commands) == 1
+
+    for bad in ['--start x', '--start -1']:
+        with pytest.raises(ValueError):
+            gssh.Query(bad, 'status:open')
+
+    s = dummy_site(lambda x: [], '2.8.0')
+    with pytest.raises(NotImplementedError):
+        gssh.Query('--start 3', 'status:open').iter_execute(s)
+
+
+def test_fields(offset_site):
+    '''
+    Check that only the options needed for the requested fields are sent
+    '''
+    commands = offset_site.state['commands']
+
+    gssh.Query('', 'status:open', 1).execute_on(offset_site)
+    for opt in ['--current-patch-set', '--patch-sets', '--all-approvals',
+                '--dependencies', '--commit-message']:
+        assert opt in commands[-1]
+
+    q = gssh.Query('', 'status:open', 1, fields=['subject', 'owner'])
+    r = q.execute_on(offset_site)
+    assert r[0].summary
+    assert '--format JSON' in commands[-1]
+    assert '--patch-sets' not in commands[-1]
+    assert '--commit-message' not in commands[-1]
+
+    q = gssh.Query('', 'status:open', 1,
+                   fields=['approvals', 'neededBy'])
+    q.execute_on(offset_site)
+    assert '--patch-sets' in commands[-1]
+    assert '--all-approvals' in commands[-1]
+    assert '--dependencies' in commands[-1]
+    assert '--current-patch-set' not in commands[-1]
+
+
+def test_page_stats(offset_site, dummy_site, open_review_text):
+    '''
+    Check that the statistics line of each page is kept, and that
+    moreChanges saves the request for an empty page.
+
+    '''
+    commands = offset_site.state['commands']
+    offset_site.state['total'] = 8
+    offset_site.state['server_limit'] = 4
+
+    q = gssh.Query('', 'status:open')
+    assert q.page_stats == []
+    assert len(q.execute_on(offset_site)) == 8
+    assert len(commands) == 2
+    assert [s['rowCount'] for s in q.page_stats] == [4, 4]
+    assert [s['moreChanges'] for s in q.page_stats] == [True, False]
+    assert q.row_count == 8
+    assert q.run_time_ms == 14
+
+    # Before 2.9 there is no moreChanges, so an empty page ends the query
+    pages = [open_review_text.splitlines(),
+             ['{"type":"stats","rowCount":0,"runTimeMilliseconds":3}']]
+    s = dummy_site(lambda cmd: pages.pop(0), '2.8.0')
+    q = gssh.Query('', 'status:open')
+    assert len(q.execute_on(s)) == 1
+    assert not pages
+    assert len(q.page_stats) == 2
+    assert q.row_count == 1
+    assert q.run_time_ms == q.page_stats[0]['runTimeMilliseconds'] + 3
+
+
+def test_adaptive_page_size(offset_site):
+    '''
+    Check that the page size grows while pages arrive quickly, never
+    exceeds the server's limit once found, and shrinks when pages are slow.
+
+    '''
+    import re
+    import time
+
+    commands = offset_site.state['commands']
+    offset_site.state['total'] = 200
+
+    def sizes():
+        return [int(re.search(r'limit:(\d+)', c).group(1)) for c in commands]
+
+    with pytest.raises(ValueError):
+        gssh.Query('', 'status:open', target_latency=-1)
+
+    q = gssh.Query('', 'status:open', page_size=10, target_latency=10)
+    assert len(q.execute_on(offset_site)) == 200
+    assert sizes()[:4] == [10, 20, 40, 80]
+
+    del commands[:]
+    offset_site.state['server_limit'] = 30
+    q = gssh.Query('', 'status:open', page_size=10, target_latency=10)
+    assert [r.number for r in q.execute_on(offset_site)] == list(range(200))
+    assert sizes()[:3] == [10, 20, 40]
+    assert all(n == 30 for n in sizes()[3:])
+
+    del commands[:]
+    execute = offset_site.execute_stream
+
+    def slow(cmd):
+        for line in execute(cmd):
+            time.sleep(0.005)
+            yield line
+
+    offset_site.execute_stream = slow
+    offset_site.state['total'] = 60
+    offset_site.state['server_limit'] = 500
+    q = gssh.Query('', 'status:open', page_size=40, target_latency=0.05)
+    assert len(q.execute_on(offset_site)) == 60
+    assert sizes()[0] == 40
+    assert sizes()[1] == 20
+
+
+def test_keep_raw(offset_site):
+    r = gssh.Query('', 'status:open', 2, keep_raw=False).execute_on(
+        offset_site)
+    assert [rv.number for rv in r] == [0, 1]
+    assert not r[0].keeps_raw
+
+
+def test_intern(offset_site):
+    r = gssh.Query('', 'status:open', 2, intern=True).execute_on(offset_site)
+    assert r[0].raw['project'] is r[1].raw['project']
+    assert r[0].raw['owner']['email'] is r[1].raw['owner']['email']
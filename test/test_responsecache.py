@@ -0,0 +1,271 @@
+'''
+Tests for the gerritssh.responsecache module.
+
+'''
+import io
+
+import pytest
+
+import gerritssh as gssh
+from gerritssh.borrowed.ssh import SSHCommandResult
+
+
+@pytest.fixture
+def site_with_cache():
+    '''
+    A factory for connected sites using a given cache, whose commands are
+    answered by the 'outputs' dictionary, keyed by command name. Every
+    command line sent over SSH is recorded in 'commands'.
+
+    '''
+    def make(cache):
+        class DummySSHClient(object):
+
+            def __init__(self):
+                self.connected = False
+
+            def execute(self, command):
+                self.connected = True
+                name = command.split()[1]
+                site.commands.append(command.split(None, 1)[1].strip())
+                return SSHCommandResult(command, io.StringIO(),
+                                        io.StringIO(site.outputs[name]),
+                                        io.StringIO())
+
+            def disconnect(self):
+                self.connected = False
+
+        site = gssh.Site('gerrit.example.com', cache=cache)
+        site._Site__ssh = DummySSHClient()
+        site.commands = []
+        site.outputs = {'version': 'gerrit version 2.9.0\n',
+                        'ls-projects': 'a\nb\n',
+                        'ls-groups': 'Developers\n',
+                        'ls-members': '',
+                        'query': '',
+                        'ban-commit': ''}
+        site.connect()
+        del site.commands[:]
+        return site
+
+    return make
+
+
+@pytest.fixture
+def cached_site(site_with_cache):
+    ''' A site with a default cache '''
+    return site_with_cache(gssh.ResponseCache())
+
+
+def _event(raw):
+    return gssh.eventstream._event(raw)
+
+
+def test_cached_commands(cached_site):
+    cache = cached_site.cache
+    assert cached_site.copy().cache is cache
+
+    assert cached_site.execute('ls-projects') == ['a', 'b']
+    assert list(cached_site.execute_stream('ls-projects  ')) == ['a', 'b']
+    assert gssh.ProjectList().execute_on(cached_site) == ['a', 'b']
+    assert cached_site.commands == ['ls-projects']
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+
+    # Commands which change the site are never cached
+    cached_site.execute('ban-commit p 1234')
+    cached_site.execute('ban-commit p 1234')
+    assert cached_site.commands.count('ban-commit p 1234') == 2
+
+    # Partly read output is not stored
+    stream = cached_site.execute_stream('ls-groups')
+    assert next(stream) == 'Developers'
+    stream.close()
+    assert cached_site.execute('ls-groups') == ['Developers']
+    assert cached_site.execute('ls-groups') == ['Developers']
+    assert cached_site.commands.count('ls-groups') == 2
+
+    assert cache.invalidate('ls-groups') == 1
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+    assert cache.invalidations == 2
+
+
+def test_change_events(cached_site):
+    cache = cached_site.cache
+    queries = ['query project:a status:open',
+               'query project:b status:open',
+               'query change:42',
+               'query status:open',
+               'query -project:b',
+               'query project:{^a.*}']
+    for q in queries:
+        cached_site.execute(q)
+    cached_site.execute('ls-projects')
+
+    merged = _event({'type': 'change-merged',
+                     'change': {'project': 'b', 'number': '7', 'id': 'I7'}})
+    assert cache.apply(merged) == 4
+    del cached_site.commands[:]
+    for q in queries:
+        cached_site.execute(q)
+    assert cached_site.commands == ['query project:b status:open',
+                                    'query status:open',
+                                    'query -project:b',
+                                    'query project:{^a.*}']
+
+    comment = _event({'type': 'comment-added',
+                      'change': {'project': 'a', 'number': '42'}})
+    assert cache.apply(comment) == 5
+    assert len(cache) == 2  # project:b and ls-projects
+
+
+@pytest.mark.parametrize('query', [
+    'query project:foo OR owner:self',
+    'query (project:foo OR status:open)',
+    'query project:foo or(change:1)',
+    'query project:foo NOT owner:self',
+    ])
+def test_alternatives_match(cached_site, query):
+    ''' Terms which may not have to hold do not exclude a change '''
+    cached_site.execute(query)
+    assert cached_site.cache.apply(
+        _event({'type': 'change-merged',
+                'change': {'project': 'bar', 'number': '7'}})) == 1
+
+
+def test_ref_events(cached_site):
+    cache = cached_site.cache
+    for cmd in ['ls-projects', 'ls-groups', 'ls-members Developers']:
+        cached_site.execute(cmd)
+
+    def ref_updated(project, ref):
+        return _event({'type': 'ref-updated',
+                       'refUpdate': {'project': project, 'refName': ref}})
+
+    assert cache.apply(ref_updated('a', 'refs/changes/01/1/1')) == 0
+    assert cache.apply(ref_updated('a', 'master')) == 1
+    assert cache.apply(ref_updated('All-Users', 'refs/groups/ab/abcd')) == 2
+
+    cached_site.execute('ls-projects')
+    assert cache.apply(_event({'type': 'project-created',
+                               'projectName': 'c'})) == 1
+
+    cached_site.execute('ls-groups')
+    assert cache.apply(gssh.EventGap(0, 1)) == 1
+
+
+def test_invalidated_while_running(cached_site):
+    cache = cached_site.cache
+    stream = cached_site.execute_stream('ls-projects')
+    assert next(stream) == 'a'
+    cache.apply(_event({'type': 'project-created'}))
+    assert list(stream) == ['b']
+    assert len(cache) == 0
+
+
+def test_follow(cached_site):
+    import json
+    import time
+
+    cache = cached_site.cache
+    cached_site.execute('ls-projects')
+    cached_site.outputs['stream-events'] = json.dumps(
+        {'type': 'project-created', 'projectName': 'c'}) + '\n'
+    cache.follow(cached_site, reconnect_delay=60)
+    deadline = time.time() + 5
+    while len(cache) and time.time() < deadline:
+        time.sleep(0.01)
+
+    cache.unfollow()
+    assert len(cache) == 0
+    assert 'stream-events' in cached_site.commands
+
+
+def test_follow_interrupted(cached_site):
+    ''' While the stream is interrupted, nothing is served or stored '''
+    import time
+
+    cache = cached_site.cache
+    cached_site.execute('ls-projects')
+    cached_site.outputs['stream-events'] = ''
+    cache.follow(cached_site, reconnect_delay=60)
+    stream = cache._ResponseCache__stream
+    deadline = time.time() + 5
+    while not stream.interrupted and time.time() < deadline:
+        time.sleep(0.01)
+    assert stream.interrupted
+
+    del cached_site.commands[:]
+    assert cached_site.execute('ls-projects') == ['a', 'b']
+    assert cached_site.execute('ls-projects') == ['a', 'b']
+    assert cached_site.commands == ['ls-projects', 'ls-projects']
+    assert len(cache) == 0
+    assert cache.invalidations == 1
+
+    cache.unfollow()
+    cached_site.execute('ls-projects')
+    cached_site.execute('ls-projects')
+    assert cached_site.commands.count('ls-projects') == 3
+
+
+def test_ttl(site_with_cache, monkeypatch):
+    import time
+
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = gssh.ResponseCache(ttl={'ls-projects': 10})
+    site = site_with_cache(cache)
+    for cmd in ['ls-projects', 'ls-groups']:
+        site.execute(cmd)
+    now[0] += 9
+    for cmd in ['ls-projects', 'ls-groups']:
+        site.execute(cmd)
+    assert cache.hits == 2
+
+    now[0] += 1
+    for cmd in ['ls-projects', 'ls-groups']:
+        site.execute(cmd)
+    assert site.commands == ['ls-projects', 'ls-groups', 'ls-projects']
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 3, 1)
+
+
+def test_lru(site_with_cache):
+    cache = gssh.ResponseCache(max_entries=2, max_bytes=30)
+    site = site_with_cache(cache)
+
+    site.execute('ls-projects')
+    site.execute('ls-groups')
+    site.execute('ls-projects')
+    site.execute('version')
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    assert cache.size == len('ab') + len('gerrit version 2.9.0')
+
+    # ls-groups was the least recently used, so was evicted
+    del site.commands[:]
+    site.execute('ls-projects')
+    site.execute('ls-groups')
+    assert site.commands == ['ls-groups']
+
+    # Entries are evicted to keep within the size, and larger output is
+    # not cached at all
+    site.outputs['query'] = 'x' * 20 + '\n'
+    site.execute('query status:open')
+    assert len(cache) == 2 and cache.size == 30
+    site.outputs['query'] = 'x' * 31 + '\n'
+    site.execute('query status:merged')
+    assert len(cache) == 2 and cache.size == 30
+    assert cache.invalidate() == 2
+    assert cache.size == 0
+
+
+def test_allowlist():
+    cache = gssh.ResponseCache(commands=['query'])
+    assert cache.cacheable('query status:open')
+    assert not cache.cacheable('ls-projects')
+    assert not gssh.ResponseCache().cacheable('ban-commit p 1234')
+
+    with pytest.raises(ValueError):
+        gssh.ResponseCache(commands=['query', 'ban-commit'])
+    with pytest.raises(ValueError):
+        gssh.ResponseCache(max_entries=0)
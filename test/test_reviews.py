@@ -93,3 +93,81 @@ def test_properties(open_review, open_review_json):
 
     with pytest.raises(AttributeError):
         _ = p.doesnotexist
+
+
+def test_missing_fields():
+    '''
+    Check that the properties of a Review with only some fields, as
+    returned by a query with a field projection, degrade to None.
+
+    '''
+    r = review.Review({'subject': 'A change', 'status': 'NEW'})
+    assert r.summary == 'A change'
+    assert not r.merged
+    assert r.host is None
+    assert r.patchsets == {}
+    assert r.highest_patchset_number is None
+    assert r.highest_patchset is None
+    assert r.ref is None
+    assert r.SHA1 is None
+    assert r.author is None
+    assert r.created_on is None
+    assert r.age is None
+    assert r.number is None
+
+    with pytest.raises(AttributeError):
+        _ = r.url
+
+    p = review.Patchset(r, {'number': '1'})
+    assert p.author is None
+    assert p.created_on is None
+
+
+def test_lazy(open_review_json):
+    '''
+    Check that patch sets and derived values are only built when they are
+    first used, and are then kept.
+
+    '''
+    raw = dict(open_review_json[0], patchSets=[1])
+    r = review.Review(raw)
+    assert r.number == int(raw['number'])
+    with pytest.raises(TypeError):
+        _ = r.patchsets
+
+    r = review.Review(open_review_json[0])
+    assert r.highest_patchset_number == max(r.patchsets)
+    assert r.patchsets is r.patchsets
+    assert r.host is r.host
+
+
+def test_compact(open_review_json):
+    '''
+    Check that a Review which does not keep its raw JSON still provides
+    the commonly used fields, and that neither class has an instance
+    dictionary.
+
+    '''
+    import copy
+
+    orj = open_review_json[0]
+    full = review.Review(orj)
+    r = review.Review(orj, keep_raw=False)
+    assert full.keeps_raw and not r.keeps_raw
+    assert not hasattr(r, '__dict__')
+    assert not hasattr(full.highest_patchset, '__dict__')
+
+    for name in ['number', 'summary', 'repo_name', 'author', 'created_on',
+                 'last_updated_on', 'merged', 'age', 'host', 'SHA1', 'ref',
+                 'highest_patchset_number']:
+        assert getattr(r, name) == getattr(full, name), name
+
+    assert r.url == orj['url']
+    assert r.branch == orj['branch']
+    assert 'patchSets' not in r.raw
+    assert list(r.patchsets) == [r.highest_patchset_number]
+    with pytest.raises(AttributeError):
+        _ = r.commitMessage
+
+    c = copy.copy(r)
+    assert c.number == r.number
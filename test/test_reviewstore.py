@@ -0,0 +1,178 @@
+'''
+Tests for the gerritssh.reviewstore module.
+
+'''
+import re
+import time
+
+import pytest
+
+import gerritssh as gssh
+
+
+@pytest.fixture
+def changes(open_review_json):
+    '''
+    Raw JSON for three changes, with the last-updated time of each one
+    hour apart, ending an hour ago.
+
+    '''
+    template = open_review_json[0]
+    now = int(time.time())
+    result = []
+    for n, (project, status) in enumerate([('a', 'NEW'), ('b', 'MERGED'),
+                                           ('a', 'MERGED')]):
+        result.append(dict(template, number=str(n + 1), project=project,
+                           status=status, id='I{0}'.format(n + 1),
+                           lastUpdated=now - 3600 * (4 - n)))
+    return result
+
+
+@pytest.fixture
+def store_site(dummy_site, changes):
+    '''
+    A site answering queries with the changes whose age is within any
+    '-age:' term. Every command is recorded in 'commands'.
+
+    '''
+    import json
+
+    def execute(cmd):
+        site.commands.append(cmd)
+        if '--start' in cmd:
+            return []
+
+        age = re.search(r'-age:(\d+)s', cmd)
+        oldest = time.time() - int(age.group(1)) if age else 0
+        return [json.dumps(c) for c in changes if c['lastUpdated'] > oldest]
+
+    site = dummy_site(execute, '2.9.0')
+    site.commands = []
+    return site
+
+
+def test_save_and_find(changes, open_review):
+    with gssh.ReviewStore() as store:
+        assert len(store) == 0
+        assert store.watermark is None
+        assert store.get(1) is None
+
+        assert store.save(gssh.Review(c) for c in changes) == 3
+        assert len(store) == 3
+        assert store.watermark == changes[-1]['lastUpdated']
+
+        r = store.get(2)
+        assert r.raw == changes[1]
+        assert r.repo_name == 'b'
+
+        assert [r.number for r in store.find()] == [3, 2, 1]
+        assert [r.number for r in store.find(project='a')] == [3, 1]
+        assert [r.number for r in store.find(project='a',
+                                             status='MERGED')] == [3]
+        assert [r.number for r in store.find(change_id='I2')] == [2]
+        assert [r.number for r in store.find(
+            updated_after=changes[0]['lastUpdated'])] == [3, 2]
+        assert store.find(owner='nobody') == []
+
+        sha = open_review.SHA1
+        assert len(store.find(revision=sha)) == 3
+
+        # Saving a change again replaces it
+        store.save([gssh.Review(dict(changes[0], status='ABANDONED'))])
+        assert len(store) == 3
+        assert store.get(1).raw['status'] == 'ABANDONED'
+
+
+def test_persistence(tmpdir, changes):
+    path = str(tmpdir.join('reviews.db'))
+    with gssh.ReviewStore(path) as store:
+        store.save([gssh.Review(changes[0])])
+
+    with gssh.ReviewStore(path) as store:
+        assert store.path == path
+        assert store.get(1).raw == changes[0]
+
+
+def test_sync(store_site, changes):
+    store = gssh.ReviewStore()
+    assert store.sync(store_site, 'status:open') == 3
+    assert '-age' not in store_site.commands[0]
+    assert 'status:open' in store_site.commands[0]
+
+    # Only changes updated since the watermark, less the margin, are
+    # fetched again
+    del store_site.commands[:]
+    assert store.sync(store_site, 'status:open', batch_size=1) == 1
+    age = int(re.search(r'-age:(\d+)s', store_site.commands[0]).group(1))
+    assert 3 * 3600 - 5 < age <= 3 * 3600 + 5
+    assert len(store) == 3
+
+
+@pytest.fixture
+def paged_site(dummy_site, changes):
+    '''
+    A factory for sites which page the changes by offset, on 2.9, or by
+    sortKey, on earlier versions. The connection drops when the command
+    numbered 'fail_at' is executed.
+
+    '''
+    import json
+
+    for n, c in enumerate(changes):
+        c['sortKey'] = 'k{0}'.format(n)
+
+    def make(version, fail_at=None):
+        def execute(cmd):
+            site.commands.append(cmd)
+            if len(site.commands) == site.fail_at:
+                raise IOError('Connection dropped')
+
+            start = re.search(r'--start (\d+)', cmd)
+            start = int(start.group(1)) if start else 0
+            resume = re.search(r'resume_sortkey:(\w+)', cmd)
+            if resume:
+                start = [c['sortKey'] for c in changes].index(
+                    resume.group(1)) + 1
+            limit = int(re.search(r'limit:(\d+)', cmd).group(1))
+            page = changes[start:start + limit]
+            stats = {'type': 'stats', 'rowCount': len(page),
+                     'moreChanges': start + limit < len(changes)}
+            return [json.dumps(c) for c in page] + [json.dumps(stats)]
+
+        site = dummy_site(execute, version)
+        site.commands = []
+        site.fail_at = fail_at
+        return site
+
+    return make
+
+
+@pytest.mark.parametrize('version,resume', [('2.9.0', '--start 2'),
+                                            ('2.8.0', 'resume_sortkey:k1')])
+def test_sync_resume(paged_site, changes, version, resume):
+    site = paged_site(version, fail_at=2)
+    store = gssh.ReviewStore()
+    with pytest.raises(IOError):
+        store.sync(site, 'status:open', batch_size=2)
+
+    # The first page was stored, with a checkpoint after it
+    assert len(store) == 2
+    state = store.sync_state('status:open')
+    assert state['position'] == 2
+    assert state['resume_key'] == 'k1'
+    assert state['watermark'] is None
+    assert state['run_watermark'] == changes[1]['lastUpdated']
+
+    # The next sync starts where the first stopped
+    site.fail_at = None
+    del site.commands[:]
+    assert store.sync(site, 'status:open', batch_size=2) == 1
+    assert resume in site.commands[0]
+    assert len(store) == 3
+
+    state = store.sync_state('status:open')
+    assert state['position'] is None
+    assert state['watermark'] == changes[-1]['lastUpdated']
+
+    # Each logical query has its own state
+    assert store.sync_state('status:merged') is None
@@ -0,0 +1,85 @@
+'''
+Tests for the gerritssh.reviewtable module.
+
+'''
+import pytest
+
+import gerritssh as gssh
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def table(open_review_json):
+    '''
+    A table of five reviews across two projects. Review n was created at
+    time 1000 * n and last updated 500 seconds later, except review 5,
+    which has no update time.
+
+    '''
+    template = open_review_json[0]
+    rows = [(1, 'a', 'NEW', 'alice'), (2, 'b', 'MERGED', 'bob'),
+            (3, 'a', 'MERGED', 'alice'), (4, 'a', 'ABANDONED', 'carol'),
+            (5, 'b', 'NEW', 'bob')]
+    reviews = []
+    for number, project, status, owner in rows:
+        raw = dict(template, number=str(number), project=project,
+                   status=status, owner={'username': owner},
+                   createdOn=1000 * number, lastUpdated=1000 * number + 500)
+        if number == 5:
+            del raw['lastUpdated']
+        reviews.append(gssh.Review(raw, keep_raw=number % 2 == 0))
+
+    return gssh.ReviewTable(iter(reviews))
+
+
+def test_columns(table, open_review):
+    assert len(table) == 5
+    assert table.columns == ['created', 'number', 'owner', 'patchsets',
+                             'project', 'status', 'updated']
+    assert table['number'].tolist() == [1, 2, 3, 4, 5]
+    assert table['project'].decoded() == ['a', 'b', 'a', 'a', 'b']
+    assert table['project'].labels == ['a', 'b']
+    assert table['project'][1] == 'b'
+    assert list(table['owner']) == ['alice', 'bob', 'alice', 'carol', 'bob']
+    assert table['created'][0] == np.datetime64(1000, 's')
+    assert np.isnat(table['updated'][4])
+    assert (table['patchsets'] == open_review.highest_patchset_number).all()
+
+    assert len(gssh.ReviewTable()) == 0
+    with pytest.raises(KeyError):
+        table['nosuchcolumn']
+
+
+def test_filter(table):
+    merged = table.filter(table['status'] == 'MERGED')
+    assert merged['number'].tolist() == [2, 3]
+    assert merged['project'].decoded() == ['b', 'a']
+
+    assert table.filter(table['status'] != 'MERGED')['number'].tolist() == \
+        [1, 4, 5]
+    assert len(table.filter(table['status'] == 'DRAFT')) == 0
+    assert table.filter(table['owner'].isin(['bob', 'carol']))[
+        'number'].tolist() == [2, 4, 5]
+    assert table.filter(table['number'] > 3)['number'].tolist() == [4, 5]
+    assert table.filter(np.array([4, 0]))['number'].tolist() == [5, 1]
+
+
+def test_group_by(table):
+    groups = table.group_by('project')
+    assert sorted(groups) == ['a', 'b']
+    assert groups['a']['number'].tolist() == [1, 3, 4]
+    assert groups['b']['number'].tolist() == [2, 5]
+    assert table.counts('status') == {'NEW': 2, 'MERGED': 2, 'ABANDONED': 1}
+    assert table.counts('number') == dict((n, 1) for n in range(1, 6))
+
+
+def test_ages(table, open_review_json):
+    ages = table.ages()
+    assert (ages[:4] == np.timedelta64(500, 's')).all()
+    assert np.isnat(ages[4])
+
+    # As for Review.age, an update before creation gives an age of zero
+    r = gssh.Review(dict(open_review_json[0], createdOn=200, lastUpdated=150))
+    assert gssh.ReviewTable([r]).ages()[0] == np.timedelta64(0, 's')
+    assert r.age.total_seconds() == 0
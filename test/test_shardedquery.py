@@ -0,0 +1,146 @@
+'''
+Tests for the gerritssh.shardedquery module.
+
+'''
+import datetime
+import json
+import re
+
+import pytest
+
+import gerritssh as gssh
+
+
+@pytest.fixture
+def sharded_site(dummy_site, open_review_json):
+    '''
+    A site whose query results depend on the 'project:' term. Project 'a'
+    has changes 1, 3 and 5, project 'b' has 2, 3 and 4. Change 3 appears
+    in both, and the last-updated time of each change is its number.
+
+    '''
+    changes = {'a': [5, 3, 1], 'b': [4, 3, 2]}
+    template = open_review_json[0]
+
+    def execute(cmd):
+        project = re.search(r'project:(\w+)', cmd).group(1)
+        if 'resume_sortkey' in cmd or '--start' in cmd:
+            return []
+
+        rows = []
+        for n in changes[project]:
+            raw = dict(template, number=str(n), lastUpdated=n,
+                       sortKey='key{0}'.format(n))
+            rows.append(json.dumps(raw))
+        return rows + ['{"type":"stats","rowCount":3}']
+
+    return dummy_site(execute, '2.9.0')
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        gssh.ShardedQuery('', 'status:open')
+
+    with pytest.raises(ValueError):
+        gssh.ShardedQuery('', 'status:open', ['project:a'], prefetch=0)
+
+    with pytest.raises(ValueError):
+        gssh.ShardedQuery('', 'status:open', ['project:a'], max_workers=0)
+
+    with pytest.raises(SystemExit):
+        gssh.ShardedQuery('--badoption', 'status:open', ['project:a'])
+
+    q = gssh.ShardedQuery('', 'status:open', ['project:a', 'project:b'])
+    assert q.shards == ['project:a', 'project:b']
+    assert q.results == []
+
+
+def test_ordered(sharded_site):
+    q = gssh.ShardedQuery('', 'status:open',
+                          gssh.project_shards(['a', 'b']))
+    r = q.execute_on(sharded_site)
+    assert [rv.number for rv in r] == [5, 4, 3, 2, 1]
+    assert [rv.number for rv in q] == [5, 4, 3, 2, 1]
+
+    q = gssh.ShardedQuery('', 'status:open', ['project:a', 'project:b'],
+                          dedupe=False)
+    r = q.execute_on(sharded_site)
+    assert [rv.number for rv in r] == [5, 4, 3, 3, 2, 1]
+
+    q = gssh.ShardedQuery('', 'status:open', ['project:a', 'project:b'],
+                          max_results=2)
+    assert [rv.number for rv in q.execute_on(sharded_site)] == [5, 4]
+
+
+def test_unordered(sharded_site):
+    q = gssh.ShardedQuery('', 'status:open', ['project:a', 'project:b'],
+                          ordered=False)
+    r = q.execute_on(sharded_site)
+    assert sorted(rv.number for rv in r) == [1, 2, 3, 4, 5]
+
+
+def test_max_workers(sharded_site):
+    '''
+    Check that no more than max_workers shards run at once, defaulting to
+    the site's limits, and that the remaining shards are queued.
+
+    '''
+    import threading
+    import time
+
+    execute = sharded_site.execute_stream
+    lock = threading.Lock()
+    running = {'now': 0, 'most': 0}
+
+    def counting(cmd):
+        with lock:
+            running['now'] += 1
+            running['most'] = max(running['most'], running['now'])
+        try:
+            time.sleep(0.02)
+            return list(execute(cmd))
+        finally:
+            with lock:
+                running['now'] -= 1
+
+    sharded_site.execute_stream = counting
+    shards = ['project:a', 'project:b'] * 3
+
+    for ordered in [True, False]:
+        running['most'] = 0
+        q = gssh.ShardedQuery('', 'status:open', shards, ordered=ordered)
+        assert sorted(rv.number for rv in q.execute_on(sharded_site)) == \
+            [1, 2, 3, 4, 5]
+        assert running['most'] == 1
+
+    running['most'] = 0
+    q = gssh.ShardedQuery('', 'status:open', shards, dedupe=False,
+                          max_workers=2)
+    assert len(q.execute_on(sharded_site)) == 18
+    assert running['most'] == 2
+
+
+def test_failures(dummy_site, sharded_site):
+    q = gssh.ShardedQuery('', 'status:open', ['project:c'])
+    with pytest.raises(KeyError):
+        q.execute_on(sharded_site)
+
+    s = dummy_site(lambda x: [], '2.4.0')
+    q = gssh.ShardedQuery('--all-reviewers', '', ['project:a'])
+    with pytest.raises(NotImplementedError):
+        q.iter_execute(s)
+
+
+def test_time_windows():
+    start = datetime.datetime(2014, 1, 1)
+    end = datetime.datetime(2014, 1, 3)
+    shards = gssh.time_window_shards(start, end, 2)
+    assert shards == [
+        '\'after:"2014-01-01 00:00:00" before:"2014-01-02 00:00:00"\'',
+        '\'after:"2014-01-02 00:00:00" before:"2014-01-03 00:00:00"\'']
+
+    with pytest.raises(ValueError):
+        gssh.time_window_shards(start, end, 0)
+
+    with pytest.raises(ValueError):
+        gssh.time_window_shards(end, start, 2)
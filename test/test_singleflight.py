@@ -0,0 +1,135 @@
+'''
+Tests for the coalescing of commands in gerritssh.internal.singleflight
+
+'''
+import threading
+import time
+
+import gerritssh
+from gerritssh.internal.singleflight import SingleFlight
+
+
+def _start(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def _wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_shared_output():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls, results = [], []
+
+    def execute():
+        calls.append(1)
+        release.wait()
+        return iter(['a', 'b'])
+
+    def caller():
+        results.append(list(flights.stream('ls-projects', execute)))
+
+    leader = _start(1, caller)
+    _wait_for(lambda: calls)
+    followers = _start(4, caller)
+    time.sleep(0.05)
+    release.set()
+    for t in leader + followers:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [['a', 'b']] * 5
+    assert flights.shared == 4
+
+    # Once finished, the next call runs the command again
+    assert list(flights.stream('ls-projects', execute)) == ['a', 'b']
+    assert len(calls) == 2
+
+
+def test_shared_error():
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def execute():
+        release.wait()
+        raise IOError('failed')
+        yield
+
+    def caller():
+        try:
+            list(flights.stream('query x', execute))
+        except IOError as e:
+            errors.append(e)
+
+    threads = _start(3, caller)
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 3
+    assert errors[0] is errors[1] is errors[2]
+
+
+def test_abandoned_and_reentrant():
+    flights = SingleFlight()
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return iter(['a', 'b'])
+
+    # The same thread is never made to wait for itself
+    outer = flights.stream('ls-groups', execute)
+    assert next(outer) == 'a'
+    assert list(flights.stream('ls-groups', execute)) == ['a', 'b']
+    assert len(calls) == 2
+
+    # Once the output has begun, other callers run the command themselves,
+    # as it is not being kept for them
+    results = []
+    late = _start(1, lambda: results.append(
+        list(flights.stream('ls-groups', execute))))
+    late[0].join()
+    assert results == [['a', 'b']]
+    assert len(calls) == 3
+    outer.close()
+
+    # A follower of an abandoned call runs the command itself
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait()
+        return iter(['a', 'b'])
+
+    def abandon():
+        stream = flights.stream('ls-members x', slow)
+        next(stream)
+        stream.close()
+
+    del results[:]
+    leader = _start(1, abandon)
+    _wait_for(lambda: len(calls) == 4)
+    follower = _start(1, lambda: results.append(
+        list(flights.stream('ls-members x', slow))))
+    time.sleep(0.05)
+    release.set()
+    for t in leader + follower:
+        t.join()
+    assert results == [['a', 'b']]
+    assert len(calls) == 5
+    assert flights.shared == 0
+
+
+def test_site_without_coalescing():
+    s = gerritssh.Site('gerrit.example.com', coalesce=False)
+    assert s.coalesced == 0
+    assert s.copy().coalesced == 0
@@ -219,3 +219,122 @@ def test_command_exceptions():
 
     with pytest.raises(ValueError):
         DummyCommand(None, None, '--dummy')
+
+
+def test_channel_limit(monkeypatch):
+    import io
+    import threading
+    from gerritssh.borrowed import ssh
+
+    with pytest.raises(ValueError):
+        gerritssh.Site('gerrit.example.com', pool_size=2, max_channels=2)
+
+    with pytest.raises(ValueError):
+        ssh.GerritSSHClient('gerrit.example.com', max_channels=0)
+
+    s = gerritssh.Site('gerrit.example.com', max_channels=2)
+    assert s.max_channels == 2
+    assert s.copy().max_channels == 2
+
+    client = ssh.GerritSSHClient('gerrit.example.com', max_channels=2)
+    monkeypatch.setattr(client, '_connect', lambda: None)
+    monkeypatch.setattr(client, 'exec_command',
+                        lambda *args, **kwargs: (io.StringIO(),
+                                                 io.StringIO(),
+                                                 io.StringIO()))
+
+    # Two channels may be open at once, the third has to wait
+    r1 = client.execute('one')
+    r2 = client.execute('two')
+    done = threading.Event()
+
+    def third():
+        client.execute('three').close()
+        done.set()
+
+    t = threading.Thread(target=third)
+    t.start()
+    assert not done.wait(0.1)
+    r2.close()
+    assert done.wait(1)
+    t.join()
+    r1.close()
+
+
+def test_execute_stream(mocked_output):
+    closed = []
+
+    def lines(cmd):
+        return 'first\nsecond\n\nthird\n'
+
+    s = mocked_output(lines, connected=True)
+    client = s._Site__ssh
+    execute = client.execute
+
+    def tracking_execute(command):
+        result = execute(command)
+        result.add_close_callback(lambda: closed.append(command))
+        return result
+
+    client.execute = tracking_execute
+
+    stream = s.execute_stream('somecommand')
+    assert not closed, 'Command sent before iteration started'
+    assert next(stream) == 'first'
+    assert list(stream) == ['second', '', 'third']
+    assert closed == ['gerrit somecommand ']
+
+    # Abandoning a stream part way through still releases the channel
+    stream = s.execute_stream('other')
+    assert next(stream) == 'first'
+    stream.close()
+    assert closed[-1] == 'gerrit other '
+
+    with pytest.raises(gerritssh.InvalidCommandError):
+        s.execute_stream('')
+    with pytest.raises(gerritssh.InvalidCommandError):
+        s.execute_stream(gerritssh.ProjectList())
+    s.disconnect()
+    with pytest.raises(gerritssh.SSHConnectionError):
+        s.execute_stream('somecommand')
+
+
+def test_coalescing(mocked_output):
+    import threading
+    import time
+
+    release = threading.Event()
+    sent = []
+
+    def output(cmd):
+        sent.append(cmd)
+        if 'ls-members' in cmd:
+            release.wait()
+        return 'id\tusername\tfull name\temail\n1\tjdoe\tJane\tj@x\n'
+
+    site = mocked_output(output, connected=True)
+    results = []
+
+    def lookup():
+        results.append(gerritssh.ListMembers('Devs').execute_on(site))
+
+    leader = threading.Thread(target=lookup)
+    leader.start()
+    while not sent:
+        time.sleep(0.01)
+    followers = [threading.Thread(target=lookup) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+
+    assert len(sent) == 1
+    assert len(results) == 4 and results[1:] == results[:3]
+    assert site.coalesced == 3
+
+    # Commands which change the site are always sent
+    site.execute('ban-commit p 1234')
+    site.execute('ban-commit p 1234')
+    assert len(sent) == 3
@@ -0,0 +1,98 @@
+'''
+Tests for the connection pool in gerritssh.internal.sshpool
+
+'''
+import io
+import threading
+
+import pytest
+
+import gerritssh
+from gerritssh.borrowed import ssh
+from gerritssh.borrowed.ssh import SSHCommandResult
+from gerritssh.internal.sshpool import SSHConnectionPool
+
+
+class DummySSHClient(object):
+    '''
+    Stands in for GerritSSHClient, recording how many commands each
+    instance has been asked to run.
+
+    '''
+    def __init__(self, *args):
+        self.connected = False
+        self.executed = []
+
+    def _connect(self):
+        self.connected = True
+
+    def execute(self, command):
+        self.connected = True
+        self.executed.append(command)
+        return SSHCommandResult(command,
+                                io.StringIO(),
+                                io.StringIO(u'gerrit version 2.9.0\n'),
+                                io.StringIO())
+
+    def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture
+def dummy_clients(monkeypatch):
+    monkeypatch.setattr(ssh, 'GerritSSHClient', DummySSHClient)
+
+
+def test_pool_init(dummy_clients):
+    with pytest.raises(ValueError):
+        SSHConnectionPool(0, 'gerrit.example.com')
+
+    pool = SSHConnectionPool(3, 'gerrit.example.com')
+    assert pool.size == 3
+    assert not pool.connected
+    assert pool.warm_up() is pool
+    assert pool.connected
+    assert pool.disconnect() is pool
+    assert not pool.connected
+
+
+def test_pool_checkout(dummy_clients):
+    pool = SSHConnectionPool(2, 'gerrit.example.com')
+    r1 = pool.execute('one')
+    r2 = pool.execute('two')
+
+    # Both connections are now checked out, so a third command must
+    # wait until one of them is returned.
+    done = threading.Event()
+
+    def third():
+        pool.execute('three').close()
+        done.set()
+
+    t = threading.Thread(target=third)
+    t.start()
+    assert not done.wait(0.1)
+    r1.close()
+    assert done.wait(1)
+    t.join()
+    r2.close()
+    r1.close()  # A second close must not return the connection twice
+    assert 'idle=2' in repr(pool)
+
+
+def test_pooled_site(dummy_clients):
+    with pytest.raises(ValueError):
+        gerritssh.Site('gerrit.example.com', pool_size=0)
+
+    s = gerritssh.Site('gerrit.example.com', pool_size=3)
+    assert s.pool_size == 3
+    s.connect()
+    assert s.connected
+    assert str(s.version) == '2.9.0'
+    pool = s._Site__ssh
+    assert 'idle=3' in repr(pool)
+
+    # Copies keep the pool size, but do not share the connections
+    c = s.copy()
+    assert c.pool_size == 3
+    assert not c.connected